@@ -0,0 +1,24 @@
+"""
+BATCH PROGRAM
+PHY 407 - Gait Distinction via Hip-Knee Coordination
+Authors:
+        Abdullah Zafar, 999730411
+"""
+from PHY407_Zafar_Functions_Batch import runbatch
+import argparse
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resumable batch run of the gait analysis over a manifest of trials")
+    parser.add_argument("manifest", help="JSON manifest of input files and parameters")
+    parser.add_argument("--workdir", default=None, help="directory for checkpoints (default: <manifest>.run)")
+    parser.add_argument("--jobs", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--block", type=int, default=8, help="distance matrix rows per checkpoint")
+    args = parser.parse_args()
+
+    workdir = args.workdir if args.workdir else args.manifest + ".run"
+    W, A, labels = runbatch(args.manifest, workdir, args.jobs, args.block)
+    print("Trials: " + str(labels))
+    print("Wasserstein distance matrix (normalized):")
+    print(W.round(3))
+    print("Adjacency matrix:")
+    print(A)
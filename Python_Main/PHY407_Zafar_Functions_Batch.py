@@ -0,0 +1,436 @@
+"""
+Helper Functions - Resumable Batch Runner
+PHY 407 - Gait Distinction via Hip-Knee Coordination
+Authors:
+        Abdullah Zafar, 999730411
+"""
+
+from PHY407_Zafar_Functions_Main import continuousrelphase
+from PHY407_Zafar_Functions_Service import trialdiagram
+from PHY407_Zafar_Functions_Wasserstein import wassersteinpair
+from PHY407_Zafar_Functions_DiagramStore import creatediagramstore, opendiagramstore, appenddiagram, readintervals
+from PHY407_Zafar_Functions_JIT import warmup
+from PHY407_Zafar_Functions_SharedMemory import arena, attachworker, detachworker, workerview
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import contextlib
+import hashlib
+import json
+import io
+import os
+
+# Files and directories making up a batch work directory
+BATCH_JOURNAL = "progress.jsonl"
+BATCH_CRP = "crp"
+BATCH_DIAGRAMS = "diagrams"
+BATCH_DISTANCES = "distances"
+# Parameters a manifest may set, with the values MainProgram uses
+BATCH_DEFAULTS = {"nlandmarks": 10, "start": 0, "step": 0.01, "end": 3, "k": 3, "A_thresh": 0.5}
+
+def loadmanifest(path):
+    """
+    Read a batch manifest: a JSON file listing the input files and parameters
+
+        {"trials": [{"file": "data_sprint_1.txt", "label": "sprint_1"}, ...],
+         "params": {"nlandmarks": 10, "start": 0, "step": 0.01, "end": 3, "k": 3, "A_thresh": 0.5}}
+
+    Relative file paths are taken relative to the manifest; missing
+    parameters take the values in BATCH_DEFAULTS
+
+    Parameters
+    ----------
+    path : string
+        manifest file
+
+    Returns
+    -------
+    manifest : dict
+        'files' --> list of absolute input file paths
+        'labels' --> list of trial labels
+        'params' --> dict of parameters
+
+    """
+    with open(path) as f:
+        raw = json.load(f)
+    root = os.path.dirname(os.path.abspath(path))
+    files = [os.path.join(root, t["file"]) for t in raw["trials"]]
+    labels = [str(t.get("label", os.path.splitext(os.path.basename(t["file"]))[0])) for t in raw["trials"]]
+    if len(set(labels)) != len(labels):
+        raise ValueError("trial labels in the manifest must be unique")
+    params = dict(BATCH_DEFAULTS, **raw.get("params", {}))
+    manifest = {"files": files, "labels": labels, "params": params}
+
+    return manifest
+
+def fingerprint(obj):
+    """
+    Short content hash of a JSON-serializable object, identifying the inputs
+    a checkpoint was computed from
+
+    Parameters
+    ----------
+    obj : object
+        JSON-serializable description of the inputs
+
+    Returns
+    -------
+    fp : string
+        16 hex digit hash
+
+    """
+    fp = hashlib.sha1(json.dumps(obj, sort_keys=True).encode()).hexdigest()[:16]
+
+    return fp
+
+def openjournal(workdir):
+    """
+    Read the completion journal of a work directory, dropping a torn last line
+
+    Each line records one finished unit of work: its stage, its key (trial
+    label or distance block) and the fingerprint of the inputs it used. A unit
+    counts as done only if its recorded fingerprint matches the current one,
+    so editing the manifest recomputes exactly the work it affects
+
+    Parameters
+    ----------
+    workdir : string
+        batch work directory
+
+    Returns
+    -------
+    journal : dict
+        'path' --> journal file
+        'done' --> dict{(stage, key): fingerprint}, latest record wins
+
+    """
+    path = os.path.join(workdir, BATCH_JOURNAL)
+    done = {}
+    valid = 0
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                done[(entry["stage"], entry["key"])] = entry["fp"]
+                valid += len(line)
+        with open(path, "r+b") as f:
+            f.truncate(valid)
+    journal = {"path": path, "done": done}
+
+    return journal
+
+def markdone(journal, stage, key, fp):
+    """
+    Record a finished unit of work, after its checkpoint is on disk
+
+    Parameters
+    ----------
+    journal : dict
+        open journal (see openjournal)
+    stage : string
+        'crp', 'intervals' or 'distances'
+    key : string
+        trial label or distance block
+    fp : string
+        fingerprint of the inputs of the unit
+
+    Returns
+    -------
+    None.
+
+    """
+    with open(journal["path"], "ab") as f:
+        f.write((json.dumps({"stage": stage, "key": key, "fp": fp}) + "\n").encode())
+        f.flush()
+        os.fsync(f.fileno())
+    journal["done"][(stage, key)] = fp
+
+def isdone(journal, stage, key, fp):
+    """
+    Check whether a unit of work was finished with the same inputs
+
+    Parameters
+    ----------
+    journal : dict
+        open journal (see openjournal)
+    stage : string
+        stage name
+    key : string
+        trial label or distance block
+    fp : string
+        fingerprint of the current inputs
+
+    Returns
+    -------
+    done : bool
+        True if the unit can be skipped
+
+    """
+    done = journal["done"].get((stage, key)) == fp
+
+    return done
+
+def savearray(path, X):
+    """
+    Write an array to a .npy file atomically: a crash leaves either the old
+    file or the complete new one
+
+    Parameters
+    ----------
+    path : string
+        destination .npy file
+    X : array
+        array to write
+
+    Returns
+    -------
+    None.
+
+    """
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, X)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def crpjob(file, label):
+    """
+    Worker job: compute the continuous relative phase of one input file
+
+    Parameters
+    ----------
+    file : string
+        input data file (see continuousrelphase)
+    label : string
+        trial label
+
+    Returns
+    -------
+    X : array[float], size: 2xN
+        CRP angle and angular velocity
+
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        crp, crpdot = continuousrelphase(np.loadtxt(file), label)
+    X = np.vstack((crp, crpdot))
+
+    return X
+
+def intervaljob(file, xminmax, yminmax, params):
+    """
+    Worker job: compute the homology intervals of one input file
+
+    Parameters
+    ----------
+    file : string
+        input data file
+    xminmax : list[float], length: 2
+        range of CRP angle values over the cohort
+    yminmax : list[float], length: 2
+        range of CRP angular velocity values over the cohort
+    params : dict
+        batch parameters (see loadmanifest)
+
+    Returns
+    -------
+    intervals : array[floats], size: Kx2
+        homology intervals of the trial
+
+    """
+    intervals = trialdiagram(np.loadtxt(file), xminmax, yminmax, params["nlandmarks"],
+                             params["start"], params["step"], params["end"])
+
+    return intervals
+
+def distancejob(labels, r0, r1, k):
+    """
+    Worker job: compute one block of rows of the lower-triangular distance
+    matrix, reading the intervals from the arena of attachworker
+
+    Parameters
+    ----------
+    labels : list[string]
+        labels of trials 0..r1-1 (trial ids in the arena)
+    r0, r1 : int
+        first and one-past-last row of the block
+    k : int
+        number of homology intervals to consider for distance computation
+
+    Returns
+    -------
+    block : array[float]
+        distances D[a,b] for a in r0..r1-1, b < a, in row order
+
+    """
+    intervals = [workerview(label, "intervals") for label in labels]
+    block = [wassersteinpair(intervals[b][-k:,:], intervals[a][-k:,:])
+             for a in range(r0, r1) for b in range(a)]
+    block = np.array(block, dtype=np.float64)
+
+    return block
+
+def runjobs(tasks, func, jobs, finish, initializer=None, initargs=()):
+    """
+    Run jobs serially or in a process pool, checkpointing each result in the
+    main process as soon as it is available
+
+    Parameters
+    ----------
+    tasks : list[tuple(key, args)]
+        key and argument tuple of each job still to do
+    func : function
+        job function, called as func(*args)
+    jobs : int
+        number of worker processes (1 --> run in this process)
+    finish : function
+        called as finish(key, result) when a job is done
+    initializer : function
+        called as initializer(*initargs) once in each worker process (in this
+        process when running serially) before its first job
+    initargs : tuple
+        arguments of initializer
+
+    Returns
+    -------
+    None.
+
+    """
+    if jobs <= 1 or len(tasks) <= 1:
+        if initializer is not None and tasks:
+            initializer(*initargs)
+        for key, args in tasks:
+            finish(key, func(*args))
+        return
+    # Compile the kernels once here; the workers load them from the cache
+    warmup()
+    with ProcessPoolExecutor(max_workers=jobs, initializer=initializer, initargs=initargs) as pool:
+        futures = {pool.submit(func, *args): key for key, args in tasks}
+        for fut in as_completed(futures):
+            finish(futures[fut], fut.result())
+
+def runbatch(manifestpath, workdir, jobs=1, blockrows=8):
+    """
+    Run the full analysis of a manifest, resuming from the checkpoints in the
+    work directory: continuous relative phase and homology intervals per
+    trial, then the Wasserstein distance matrix in blocks of rows
+
+    Parameters
+    ----------
+    manifestpath : string
+        manifest file (see loadmanifest)
+    workdir : string
+        work directory holding the journal and checkpoints
+    jobs : int
+        number of worker processes
+    blockrows : int
+        number of distance matrix rows per checkpointed block
+
+    Returns
+    -------
+    W : matrix[float], size: NxN
+        normalized Wasserstein distance matrix (as in MainProgram)
+    A : matrix[float], size: NxN
+        adjacency matrix
+    labels : list[string]
+        trial labels
+
+    """
+    manifest = loadmanifest(manifestpath)
+    files, labels, params = manifest["files"], manifest["labels"], manifest["params"]
+    n = len(files)
+    for d in (BATCH_CRP, BATCH_DISTANCES):
+        os.makedirs(os.path.join(workdir, d), exist_ok=True)
+    journal = openjournal(workdir)
+    print("---- ---- ---- ---- ---- ---- ---- ---- ---- ----")
+    print("---- BATCH RUN: " + str(n) + " trials, " + str(jobs) + " jobs ----")
+
+    # 1. Continuous relative phase, keyed on the input file contents
+    fpcrp = {}
+    for file, label in zip(files, labels):
+        st = os.stat(file)
+        fpcrp[label] = fingerprint([os.path.abspath(file), st.st_size, st.st_mtime_ns])
+    crpfile = lambda label: os.path.join(workdir, BATCH_CRP, fpcrp[label] + ".npy")
+
+    def finishcrp(label, X):
+        savearray(crpfile(label), X)
+        markdone(journal, "crp", label, fpcrp[label])
+        print("-> CRP: " + label)
+
+    tasks = [(l, (f, l)) for f, l in zip(files, labels) if not isdone(journal, "crp", l, fpcrp[l])]
+    print("1. Continuous relative phase: " + str(n-len(tasks)) + " of " + str(n) + " done")
+    runjobs(tasks, crpjob, jobs, finishcrp)
+
+    # Cross-trial normalization ranges
+    xrange, yrange = [], []
+    for label in labels:
+        X = np.load(crpfile(label))
+        xrange += [X[0].min(), X[0].max()]
+        yrange += [X[1].min(), X[1].max()]
+    xminmax = [float(min(xrange)), float(max(xrange))]
+    yminmax = [float(min(yrange)), float(max(yrange))]
+
+    # 2. Homology intervals, keyed on the CRP, ranges and parameters
+    storepath = os.path.join(workdir, BATCH_DIAGRAMS)
+    if os.path.exists(os.path.join(storepath, "index.jsonl")):
+        store = opendiagramstore(storepath)
+    else:
+        store = creatediagramstore(storepath)
+    phparams = {p: params[p] for p in ("nlandmarks", "start", "step", "end")}
+    fpint = {l: fingerprint([fpcrp[l], xminmax, yminmax, phparams]) for l in labels}
+
+    def finishintervals(label, intervals):
+        appenddiagram(store, label, intervals, dict(phparams, fp=fpint[label]))
+        markdone(journal, "intervals", label, fpint[label])
+        print("-> intervals: " + label)
+
+    tasks = [(l, (f, xminmax, yminmax, params)) for f, l in zip(files, labels)
+             if not isdone(journal, "intervals", l, fpint[l])]
+    print("2. Homology intervals: " + str(n-len(tasks)) + " of " + str(n) + " done")
+    runjobs(tasks, intervaljob, jobs, finishintervals)
+    intervals = [readintervals(store, l) for l in labels]
+
+    # 3. Distance blocks, keyed on the intervals of every trial they use
+    blocks = [(r0, min(r0+blockrows, n)) for r0 in range(1, n, blockrows)]
+    fpblock = {str(r0): fingerprint([[fpint[l] for l in labels[:r1]], r0, r1, params["k"]])
+               for r0, r1 in blocks}
+    blockfile = lambda key: os.path.join(workdir, BATCH_DISTANCES, fpblock[key] + ".npy")
+
+    def finishdistances(key, block):
+        savearray(blockfile(key), block)
+        markdone(journal, "distances", key, fpblock[key])
+        print("-> distances: rows " + key + "+")
+
+    tasks = [(str(r0), (labels[:r1], r0, r1, params["k"])) for r0, r1 in blocks
+             if not isdone(journal, "distances", str(r0), fpblock[str(r0)])]
+    print("3. Distance blocks: " + str(len(blocks)-len(tasks)) + " of " + str(len(blocks)) + " done")
+    # Workers read the intervals from one shared arena instead of receiving
+    # a pickled copy of every earlier trial with each block
+    with arena({l: {"intervals": I} for l, I in zip(labels, intervals)}) as name:
+        try:
+            runjobs(tasks, distancejob, jobs, finishdistances, attachworker, (name,))
+        finally:
+            detachworker()
+
+    # Assemble, normalize and threshold as MainProgram does
+    W = np.zeros((n, n))
+    for r0, r1 in blocks:
+        block = np.load(blockfile(str(r0)))
+        a = np.repeat(np.arange(r0, r1), np.arange(r0, r1))
+        b = np.concatenate([np.arange(r) for r in range(r0, r1)])
+        W[a, b] = block
+    W += W.transpose()
+    if np.max(W) > 0:
+        W /= np.max(W)
+    A = np.zeros((n, n))
+    A[W<params["A_thresh"]] = 1
+    np.fill_diagonal(A, 0)
+    savearray(os.path.join(workdir, "W.npy"), W)
+    savearray(os.path.join(workdir, "A.npy"), A)
+    print("---- BATCH RUN COMPLETE ----")
+
+    return W, A, labels
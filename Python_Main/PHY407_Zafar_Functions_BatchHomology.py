@@ -0,0 +1,281 @@
+"""
+Helper Functions - Batched Persistent Homology of Many Small Complexes
+PHY 407 - Gait Distinction via Hip-Knee Coordination
+Authors:
+        Abdullah Zafar, 999730411
+"""
+
+from itertools import combinations
+import numpy as np
+import time
+
+# Number of significant bits of every byte value
+BATCH_BITLENGTH = np.array([int(v).bit_length() for v in range(256)], dtype=np.int64)
+# Largest size in bytes of the packed boundary matrices of one chunk
+BATCH_MEMORY = 2**26
+
+def batchcandidates(n):
+    """
+    List every candidate simplex of a complex on n landmarks in the order
+    vrfilt uses within one epsilon (edges, then triangles, each in combination
+    order), with the face incidences that createboundarymat records
+
+    Parameters
+    ----------
+    n : int
+        number of landmarks
+
+    Returns
+    -------
+    S : matrix[int], size: Mx3
+        vertices of each candidate (third vertex -1 for edges)
+    ntri : int
+        number of triangle candidates (the last ntri rows of S)
+    src, dst : array[int]
+        candidate s is a face of candidate t for each pair (src, dst): the edges
+        of each triangle, and the triangles containing the first two vertices
+        of another triangle
+
+    """
+    E = np.array(list(combinations(range(n), 2)), dtype=np.int64).reshape(-1, 2)
+    T = np.array(list(combinations(range(n), 3)), dtype=np.int64).reshape(-1, 3)
+    S = np.vstack((np.column_stack((E, np.full(len(E), -1))), T))
+    ne = len(E)
+    # Candidate index of the edge (a, b), a < b
+    edgeid = np.zeros((n, n), dtype=np.int64)
+    edgeid[E[:,0], E[:,1]] = np.arange(ne)
+    # Candidate index of the triangle (a, b, c), a < b < c
+    triid = np.zeros((n, n, n), dtype=np.int64)
+    triid[T[:,0], T[:,1], T[:,2]] = ne + np.arange(len(T))
+
+    # Triangle-triangle incidences: simplex_i counts as a face of simplex_j
+    # when its first two vertices are in simplex_j, i.e. simplex_j = (a, b, x)
+    i, x = np.nonzero(np.all(T[:,:,None] != np.arange(n)[None,None,:], axis=1))
+    abx = np.sort(np.column_stack((T[i,0], T[i,1], x)), axis=1)
+    src = np.concatenate((edgeid[T[:,0],T[:,1]], edgeid[T[:,0],T[:,2]], edgeid[T[:,1],T[:,2]], ne + i))
+    dst = np.concatenate([ne + np.arange(len(T))]*3 + [triid[abx[:,0], abx[:,1], abx[:,2]]])
+
+    return S, len(T), src, dst
+
+def batchfiltration(landmarks, epsilon):
+    """
+    Compute the filtration order of every complex of a batch at once
+
+    Parameters
+    ----------
+    landmarks : array[float], size: BxNx2
+        B landmark sets of N points
+    epsilon : array[float]
+        epsilon grid of vrfilt
+
+    Returns
+    -------
+    val : matrix[int], size: BxM
+        epsilon index at which each candidate simplex enters (len(epsilon) --> never)
+    order : matrix[int], size: BxM
+        candidates of each complex in filtration order
+    pos : matrix[int], size: BxM
+        position of each candidate in its filtration
+
+    """
+    B, n = landmarks.shape[:2]
+    # Same arithmetic as norm
+    X = landmarks[:,:,0]
+    Y = landmarks[:,:,1]
+    D = np.sqrt((X[:,:,None]-X[:,None,:])**2 + (Y[:,:,None]-Y[:,None,:])**2)
+    V = np.searchsorted(epsilon, D.ravel(), side="right").reshape(B, n, n)
+    I, J = np.triu_indices(n, 1)
+    T = np.array(list(combinations(range(n), 3)), dtype=np.int64).reshape(-1, 3)
+    val = np.concatenate((V[:,I,J], np.maximum(np.maximum(V[:,T[:,0],T[:,1]], V[:,T[:,0],T[:,2]]),
+                                               V[:,T[:,1],T[:,2]])), axis=1)
+    # Candidates are listed in the within-epsilon order, so a stable sort on
+    # the entry value gives the order of vrfilt
+    order = np.argsort(val, axis=1, kind="stable")
+    pos = np.empty_like(order)
+    np.put_along_axis(pos, order, np.arange(val.shape[1])[None,:].repeat(B, axis=0), axis=1)
+
+    return val, order, pos
+
+def batchboundary(val, pos, ntri, src, dst, nvalues):
+    """
+    Build the bit-packed boundary matrices of a batch: one column per triangle
+    (edge columns of createboundarymat are always zero) in filtration order,
+    rows in filtration order
+
+    Parameters
+    ----------
+    val, pos : matrix[int], size: BxM
+        entry values and filtration positions (see batchfiltration)
+    ntri : int
+        number of triangle candidates
+    src, dst : array[int]
+        face incidences of the candidates (see batchcandidates)
+    nvalues : int
+        number of epsilon values
+
+    Returns
+    -------
+    cols : array[uint8], size: BxTxW
+        packed columns (np.packbits(..., bitorder="little") of the rows)
+    colpos : matrix[int], size: BxT
+        filtration position of the triangle of each column (M --> absent)
+
+    """
+    B, M = val.shape
+    ne = M - ntri
+    # Columns: triangles in filtration order
+    tripos = np.where(val[:,ne:] < nvalues, pos[:,ne:], M)
+    colorder = np.argsort(tripos, axis=1, kind="stable")
+    colpos = np.take_along_axis(tripos, colorder, axis=1)
+    slot = np.empty_like(colorder)
+    np.put_along_axis(slot, colorder, np.arange(ntri)[None,:].repeat(B, axis=0), axis=1)
+
+    # Keep incidences whose simplices are both present, face first
+    keep = (val[:,dst] < nvalues) & (pos[:,src] < pos[:,dst])
+    b, e = np.nonzero(keep)
+    # Set the bits in packed form, never holding the unpacked matrices
+    row = pos[b, src[e]]
+    cols = np.zeros((B, ntri, (M+7)//8), dtype=np.uint8)
+    np.bitwise_or.at(cols, (b, slot[b, dst[e]-ne], row >> 3), (1 << (row & 7)).astype(np.uint8))
+
+    return cols, colpos
+
+def batchpivots(cols):
+    """
+    Get the pivot (lowest nonzero row) of a stack of bit-packed columns
+
+    Parameters
+    ----------
+    cols : matrix[uint8], size: BxW
+        packed columns
+
+    Returns
+    -------
+    pivots : array[int], size: B
+        pivot row of each column (-1 for zero columns)
+
+    """
+    nz = cols != 0
+    W = cols.shape[1]
+    last = W - 1 - np.argmax(nz[:,::-1], axis=1)
+    byte = cols[np.arange(len(cols)), last]
+    pivots = np.where(nz.any(axis=1), 8*last + BATCH_BITLENGTH[byte] - 1, -1)
+
+    return pivots
+
+def batchreduce(cols, M):
+    """
+    Reduce all boundary matrices of a batch together: column c of every matrix
+    is reduced at the same time, by XOR with the earlier column owning its
+    pivot, until no matrix has a collision
+
+    Parameters
+    ----------
+    cols : array[uint8], size: BxTxW
+        packed columns (see batchboundary), reduced in place
+    M : int
+        number of rows
+
+    Returns
+    -------
+    pivots : matrix[int], size: BxT
+        pivot row of each reduced column (-1 for zero columns)
+
+    """
+    B, T = cols.shape[:2]
+    batch = np.arange(B)
+    owner = np.full((B, M+1), -1, dtype=np.int64) # pivot row --> owning column
+    pivots = np.full((B, T), -1, dtype=np.int64)
+    for c in range(T):
+        p = batchpivots(cols[:,c])
+        active = batch[(p >= 0) & (owner[batch, p] >= 0)]
+        while len(active):
+            o = owner[active, p[active]]
+            cols[active, c] ^= cols[active, o]
+            p[active] = batchpivots(cols[active, c])
+            active = active[(p[active] >= 0) & (owner[active, p[active]] >= 0)]
+        pivots[:,c] = p
+        has = p >= 0
+        owner[batch[has], p[has]] = c
+
+    return pivots
+
+def batchpersistence(landmarks, start, step, end, chunk=512):
+    """
+    Compute the homology intervals of many landmark sets at once, identical to
+    steps 3-6 of persistenthomology for each set
+
+    Parameters
+    ----------
+    landmarks : array[float], size: BxNx2
+        B landmark sets of N points each (see witnesscomplex)
+    start : float
+        smallest epsilon to use in Vietoris-Rips filtration computation
+    step : float
+        step size for epsilon to use in Vietoris-Rips filtration computation
+    end : float
+        largest epsilon to use in Vietoris-Rips filtration computation
+    chunk : int
+        largest number of complexes built and reduced together, lowered so
+        that their packed boundary matrices fit in BATCH_MEMORY bytes
+
+    Returns
+    -------
+    intervals : list[array[floats]], length: B
+        homology intervals of each landmark set (see getintervals)
+
+    """
+    landmarks = np.asarray(landmarks, dtype=np.float64)
+    epsilon = np.arange(start, end+step, step)
+    S, ntri, src, dst = batchcandidates(landmarks.shape[1])
+    M = len(S)
+    chunk = max(min(chunk, BATCH_MEMORY // max(ntri*((M+7)//8), 1)), 1)
+    intervals = []
+    for b0 in range(0, len(landmarks), chunk):
+        val, order, pos = batchfiltration(landmarks[b0:b0+chunk], epsilon)
+        cols, colpos = batchboundary(val, pos, ntri, src, dst, len(epsilon))
+        pivots = batchreduce(cols, M)
+        # Entry epsilon of the simplex at each filtration position
+        posval = epsilon[np.minimum(np.take_along_axis(val, order, axis=1), len(epsilon)-1)]
+        rows = np.arange(len(val))[:,None]
+        birth = posval[rows, np.maximum(pivots, 0)]
+        death = posval[rows, np.minimum(colpos, M-1)]
+        found = (pivots >= 0) & (death - birth > 0)
+        # Same order as getintervals: by death simplex, then sorted by lifespan
+        for i in range(len(val)):
+            k = found[i]
+            if not np.any(k):
+                intervals.append(np.array([]))
+                continue
+            int_id = (death[i,k] - birth[i,k]).argsort(kind="stable")
+            intervals.append(np.column_stack((birth[i,k], death[i,k]))[int_id])
+
+    return intervals
+
+def batchtiming(landmarks, start, step, end, chunk=512):
+    """
+    Time batchpersistence and report the cost per diagram
+
+    Parameters
+    ----------
+    landmarks : array[float], size: BxNx2
+        B landmark sets of N points each
+    start, step, end : float
+        Vietoris-Rips filtration parameters
+    chunk : int
+        number of complexes reduced together
+
+    Returns
+    -------
+    intervals : list[array[floats]], length: B
+        homology intervals of each landmark set
+    perdiagram : float
+        seconds per diagram
+
+    """
+    tstart = time.perf_counter()
+    intervals = batchpersistence(landmarks, start, step, end, chunk)
+    perdiagram = (time.perf_counter() - tstart) / max(len(intervals), 1)
+    print("-> " + str(len(intervals)) + " diagrams at " + str(round(1e6*perdiagram, 1)) + " microseconds each")
+
+    return intervals, perdiagram
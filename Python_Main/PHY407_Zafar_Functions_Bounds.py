@@ -0,0 +1,193 @@
+"""
+Helper Functions - Threshold-Only Adjacency with a Bound Cascade
+PHY 407 - Gait Distinction via Hip-Knee Coordination
+Authors:
+        Abdullah Zafar, 999730411
+"""
+
+from PHY407_Zafar_Functions_Wasserstein import wassersteinpair
+from PHY407_Zafar_Functions_Sinkhorn import batchcostmatrices, greedyassignment, settlepairs
+import numpy as np
+
+def diagrambounds(intervals, k):
+    """
+    Bound the Wasserstein distance of every pair of diagrams from per-diagram
+    summaries only, in O(k) per pair
+
+    With the diagonal projection (death, death) of projectdiagonals, the
+    persistence d-b of a point changes by at most sqrt(2) times the cost of
+    any pair of the matching. The sorted persistence values of two diagrams
+    therefore give a lower bound (at least the total persistence difference).
+    Pairing the two longest intervals and every other interval with its own
+    diagonal projection gives an upper bound
+
+    Parameters
+    ----------
+    intervals : list[array[floats]], length: N
+        list of N homology intervals
+    k : int
+        number of homology intervals to consider for distance computation
+
+    Returns
+    -------
+    lower : matrix[float], size: NxN
+        lower bound of each distance
+    upper : matrix[float], size: NxN
+        upper bound of each distance
+
+    """
+    B = [np.asarray(I, dtype=np.float64).reshape(-1, 2)[-k:,:] for I in intervals]
+    n = len(B)
+    K = max([len(b) for b in B] + [1])
+    # Persistence values, sorted and padded with zeros (diagonal points)
+    S = np.zeros((n, K))
+    longest = np.zeros((n, 2))
+    for i, b in enumerate(B):
+        if len(b):
+            pers = np.sort(b[:,1] - b[:,0])
+            S[i,K-len(b):] = pers
+            longest[i] = b[np.argmax(b[:,1] - b[:,0])]
+    total = S.sum(axis=1)
+
+    lower = np.sum(np.abs(S[:,None,:] - S[None,:,:]), axis=2) / np.sqrt(2)
+    # Longest to longest, the rest to the diagonal; the two unused diagonal
+    # projections are paired with each other
+    has = S[:,-1] > 0
+    paired = (np.sqrt(np.sum((longest[:,None,:] - longest[None,:,:])**2, axis=2))
+              + (total - S[:,-1])[:,None] + (total - S[:,-1])[None,:]
+              + np.sqrt(2)*np.abs(longest[:,None,1] - longest[None,:,1]))
+    upper = total[:,None] + total[None,:]
+    both = has[:,None] & has[None,:]
+    upper[both] = np.minimum(upper[both], paired[both])
+
+    return lower, upper
+
+def matchingbounds(intervals, pairs, k):
+    """
+    Bound the Wasserstein distance of diagram pairs from their cost matrices,
+    in O(k^2) per pair: the larger of the row-minimum and column-minimum sums
+    is a lower bound, the greedy (cheapest entry first) assignment an upper
+    bound
+
+    Parameters
+    ----------
+    intervals : list[array[floats]], length: N
+        list of N homology intervals
+    pairs : array[int], size: Px2
+        (a, b) trials of each pair
+    k : int
+        number of homology intervals to consider for distance computation
+
+    Returns
+    -------
+    lower : array[float], size: P
+        lower bound of each distance
+    upper : array[float], size: P
+        upper bound of each distance
+
+    """
+    C, mask = batchcostmatrices(intervals, pairs, k)
+    valid = mask[:,:,None] & mask[:,None,:]
+    Cm = np.where(valid, C, np.inf)
+    rows = np.sum(np.where(mask, np.min(Cm, axis=2), 0), axis=1)
+    cols = np.sum(np.where(mask, np.min(Cm, axis=1), 0), axis=1)
+    lower = np.maximum(rows, cols)
+    upper = greedyassignment(C, -C, valid)
+
+    return lower, upper
+
+def settled(lower, upper, A_thresh):
+    """
+    Find the pairs whose adjacency is decided by their bounds, for every
+    possible max(W) within the bounds
+
+    Parameters
+    ----------
+    lower, upper : array[float], size: P
+        bounds of each distance
+    A_thresh : float
+        adjacency threshold on the normalized distance
+
+    Returns
+    -------
+    done : array[bool], size: P
+        True for the pairs that are adjacent or not adjacent for sure
+
+    """
+    if len(lower) == 0:
+        return np.zeros(0, dtype=bool)
+    done = (upper < A_thresh*lower.max()) | (lower >= A_thresh*upper.max())
+
+    return done
+
+def thresholdadjacency(intervals, k, A_thresh=0.5, chunk=1024):
+    """
+    Compute the adjacency matrix of W/max(W) < A_thresh without solving every
+    pair exactly
+
+    Bounds are tightened in a cascade: diagram summaries for every pair, then
+    cost matrix bounds for the pairs those leave undecided. Exact solves are
+    only made for the pairs that may hold max(W) and for the pairs whose
+    bounds still straddle the threshold (see settlepairs), so A equals the
+    adjacency matrix of MainProgram
+
+    Parameters
+    ----------
+    intervals : list[array[floats]], length: N
+        list of N homology intervals
+    k : int
+        number of homology intervals to consider for distance computation
+    A_thresh : float
+        adjacency threshold on the normalized distance
+    chunk : int
+        number of pairs whose cost matrix bounds are computed together
+
+    Returns
+    -------
+    A : matrix[float], size: NxN
+        adjacency matrix
+    report : dict
+        'pairs' --> number of pairs
+        'summary' --> pairs decided by the diagram summary bounds
+        'matching' --> pairs decided by the cost matrix bounds
+        'exact' --> pairs solved exactly
+        'avoided' --> exact solves avoided
+
+    """
+    print("---- COMPUTING THRESHOLD ADJACENCY: A_thresh = " + str(A_thresh) + " ----")
+    n = len(intervals)
+    a, b = np.triu_indices(n, 1)
+    pairs = np.column_stack((a, b))
+
+    # 1. Diagram summary bounds
+    L, U = diagrambounds(intervals, k)
+    lower, upper = L[a, b], U[a, b]
+    summary = settled(lower, upper, A_thresh)
+
+    # 2. Cost matrix bounds of the undecided pairs
+    todo = np.where(~summary)[0]
+    for p0 in range(0, len(todo), chunk):
+        idx = todo[p0:p0+chunk]
+        lo, up = matchingbounds(intervals, pairs[idx], k)
+        lower[idx] = np.maximum(lower[idx], lo)
+        upper[idx] = np.minimum(upper[idx], up)
+    matching = settled(lower, upper, A_thresh) & ~summary
+
+    # 3. Exact solves for the maximum and the straddling pairs
+    exact = lambda i, j: wassersteinpair(intervals[i][-k:,:], intervals[j][-k:,:])
+    value, solved, Wmax = settlepairs(pairs, lower, upper, exact, A_thresh)
+
+    A = np.zeros((n, n))
+    if Wmax > 0:
+        adjacent = value/Wmax < A_thresh
+    else:
+        adjacent = np.zeros(len(pairs), dtype=bool)
+    A[a[adjacent], b[adjacent]] = 1
+    A += A.transpose()
+    report = {"pairs": len(pairs), "summary": int(summary.sum()), "matching": int(matching.sum()),
+              "exact": int(solved.sum()), "avoided": len(pairs) - int(solved.sum())}
+    print("-> " + str(report["pairs"]) + " pairs: " + str(report["summary"]) + " decided by summaries, "
+          + str(report["matching"]) + " by matching bounds, " + str(report["exact"]) + " solved exactly ("
+          + str(report["avoided"]) + " exact solves avoided)")
+
+    return A, report
@@ -0,0 +1,344 @@
+"""
+Helper Functions - Persistent Cohomology with Implicit Coboundaries
+PHY 407 - Gait Distinction via Hip-Knee Coordination
+Authors:
+        Abdullah Zafar, 999730411
+"""
+
+import numpy as np
+import time
+
+def landmarkdistances(points):
+    """
+    Compute the distance matrix of a list of landmark points, with the same
+    arithmetic as norm
+
+    Parameters
+    ----------
+    points : list[tuples], length: N
+        list of N points, each point expressed as a tuple (x,y)
+
+    Returns
+    -------
+    D : matrix[float], size: NxN
+        Euclidean distance between each pair of points
+
+    """
+    P = np.array(points, dtype=np.float64).reshape(-1, 2)
+    D = np.sqrt((P[:,None,0]-P[None,:,0])**2 + (P[:,None,1]-P[None,:,1])**2)
+
+    return D
+
+def filtrationvalues(D, start=None, step=None, end=None):
+    """
+    Map each edge of the Rips complex to the index of its filtration value
+
+    With a grid (start, step, end), an edge enters at the first epsilon of
+    np.arange(start, end+step, step) strictly larger than its length, as in
+    vrfilt; edges longer than the last epsilon never enter. Without a grid the
+    distinct edge lengths themselves are the filtration values
+
+    Parameters
+    ----------
+    D : matrix[float], size: NxN
+        landmark distance matrix
+    start, step, end : float
+        epsilon grid of vrfilt (None --> exact distances)
+
+    Returns
+    -------
+    V : matrix[int], size: NxN
+        filtration value index of each edge (len(values) if the edge never enters)
+    values : array[float]
+        filtration values
+
+    """
+    n = len(D)
+    if start is None:
+        values, V = np.unique(D, return_inverse=True)
+        V = V.reshape(n, n)
+    else:
+        values = np.arange(start, end+step, step)
+        V = np.searchsorted(values, D, side="right")
+    V = np.asarray(V, dtype=np.int64)
+    np.fill_diagonal(V, len(values))
+
+    return V, values
+
+def edgeindex(i, j):
+    """
+    Index of the edge {i, j} in the combinatorial number system: C(j,2) + i
+
+    Parameters
+    ----------
+    i, j : int or array[int]
+        vertices of the edge, i < j
+
+    Returns
+    -------
+    index : int or array[int]
+        edge index
+
+    """
+    index = j*(j-1)//2 + i
+
+    return index
+
+def edgevertices(index):
+    """
+    Recover the vertices of an edge from its combinatorial number system index
+
+    Parameters
+    ----------
+    index : int or array[int]
+        edge index (see edgeindex)
+
+    Returns
+    -------
+    i, j : int or array[int]
+        vertices of the edge, i < j
+
+    """
+    j = ((1 + np.sqrt(1 + 8*np.asarray(index, dtype=np.float64)))/2).astype(np.int64)
+    # Correct the floating point estimate of the largest j with C(j,2) <= index
+    j -= (j*(j-1)//2 > index)
+    j += ((j+1)*j//2 <= index)
+    i = index - j*(j-1)//2
+
+    return i, j
+
+def coboundary(e, V, nvalues):
+    """
+    Enumerate the cofacets (triangles) of an edge that enter the filtration
+
+    Triangles are never stored; each is named by its filtration key
+    value*N^3 + i*N^2 + j*N + k (i<j<k), which orders triangles as vrfilt does:
+    by filtration value, then in the lexicographic order of combinations
+
+    Parameters
+    ----------
+    e : int
+        edge index (see edgeindex)
+    V : matrix[int], size: NxN
+        filtration value index of each edge (see filtrationvalues)
+    nvalues : int
+        number of filtration values
+
+    Returns
+    -------
+    keys : array[int]
+        filtration key of each cofacet
+
+    """
+    n = len(V)
+    i, j = edgevertices(e)
+    k = np.arange(n)
+    val = np.maximum(np.maximum(V[i,k], V[j,k]), V[i,j])
+    k = k[(val < nvalues) & (k != i) & (k != j)]
+    val = np.maximum(np.maximum(V[i,k], V[j,k]), V[i,j])
+    # Sort the three vertices of each triangle
+    a = np.minimum(i, k)
+    c = np.maximum(j, k)
+    b = i + j + k - a - c
+    keys = ((val*n + a)*n + b)*n + c
+
+    return keys
+
+def smallestcofacet(e, V, nvalues):
+    """
+    Find the first cofacet of an edge in the filtration order of coboundary,
+    without enumerating the others
+
+    For a fixed filtration value the key of triangle {i, j, k} grows with k,
+    so the first cofacet is the lowest k of smallest filtration value
+
+    Parameters
+    ----------
+    e : int
+        edge index (see edgeindex)
+    V : matrix[int], size: NxN
+        filtration value index of each edge (see filtrationvalues)
+    nvalues : int
+        number of filtration values
+
+    Returns
+    -------
+    key : int
+        filtration key of the first cofacet (-1 if no cofacet enters)
+
+    """
+    n = len(V)
+    i, j = edgevertices(e)
+    i, j = int(i), int(j)
+    val = np.maximum(np.maximum(V[i,:], V[j,:]), V[i,j])
+    val[[i, j]] = nvalues
+    k = int(val.argmin())
+    if val[k] >= nvalues:
+        return -1
+    a, b, c = sorted((i, j, k))
+    key = ((int(val[k])*n + a)*n + b)*n + c
+
+    return key
+
+def h0deaths(edges, n):
+    """
+    Find the edges that merge two connected components (the H0 deaths), by
+    union-find over the edges in filtration order
+
+    Parameters
+    ----------
+    edges : array[int]
+        edge indices in filtration order
+    n : int
+        number of vertices
+
+    Returns
+    -------
+    deaths : array[bool]
+        True for each edge (in the given order) that joins two components
+
+    """
+    parent = list(range(n))
+
+    def root(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    I, J = edgevertices(edges)
+    deaths = np.zeros(len(edges), dtype=bool)
+    for t in range(len(edges)):
+        ri = root(int(I[t]))
+        rj = root(int(J[t]))
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+            deaths[t] = True
+
+    return deaths
+
+def cohomologyintervals(D, start=None, step=None, end=None, stats=None):
+    """
+    Compute the H1 persistence intervals of the Rips filtration of a distance
+    matrix by reducing the coboundary matrix, without building the simplex
+    list or any matrix
+
+    Edges are processed from the last to the first to enter the filtration.
+    Edges that kill an H0 class are skipped (clearing). For each remaining
+    edge only the first triangle of its coboundary is found; if it is not yet
+    the pivot of another column the pair is found at once (emergent pair) and
+    the rest of the coboundary is never generated. Otherwise the coboundary is
+    generated on the fly and reduced by adding the coboundaries of earlier
+    columns, and only the set of edges added (the column of V) is stored, so
+    memory stays proportional to the number of edges
+
+    Parameters
+    ----------
+    D : matrix[float], size: NxN
+        landmark distance matrix (see landmarkdistances)
+    start, step, end : float
+        epsilon grid of vrfilt (None --> exact distances)
+    stats : dict
+        if given, filled with 'edges', 'cleared', 'emergent', 'reduced' counts
+
+    Returns
+    -------
+    intervals : array[float], size: Kx2
+        array of the K homology intervals, in the order of getintervals
+            --> each row is an interval
+            --> column 1: formation of hole, column 2: closure of hole
+
+    """
+    n = len(D)
+    V, values = filtrationvalues(D, start, step, end)
+    nvalues = len(values)
+
+    # Edges in filtration order: value, then lexicographic (i, j)
+    I, J = np.triu_indices(n, 1)
+    val = V[I, J]
+    keep = val < nvalues
+    I, J, val = I[keep], J[keep], val[keep]
+    order = np.lexsort((J, I, val))
+    edges = edgeindex(I[order], J[order])
+    births = val[order]
+    cleared = h0deaths(edges, n)
+
+    lookup = {} # pivot triangle key --> edge owning it
+    records = {} # edge --> edges of its column of V (for columns that needed reduction)
+    pairs = [] # (death triangle key, birth value index, death value index)
+    nemergent = 0
+    for t in range(len(edges)-1, -1, -1):
+        if cleared[t]:
+            continue
+        e = int(edges[t])
+        pivot = smallestcofacet(e, V, nvalues)
+        if pivot < 0:
+            continue
+        if pivot not in lookup:
+            # Emergent pair: the column is already reduced
+            nemergent += 1
+        else:
+            column = set(coboundary(e, V, nvalues).tolist())
+            added = {e}
+            while pivot in lookup:
+                owner = lookup[pivot]
+                for f in records.get(owner, (owner,)):
+                    column ^= set(coboundary(f, V, nvalues).tolist())
+                added ^= set(records.get(owner, (owner,)))
+                if not column:
+                    break
+                pivot = min(column)
+            if not column:
+                continue
+            records[e] = tuple(added)
+        lookup[pivot] = e
+        pairs.append((pivot, int(births[t]), pivot // n**3))
+
+    if stats is not None:
+        stats.update({"edges": len(edges), "cleared": int(cleared.sum()),
+                      "emergent": nemergent, "reduced": len(records)})
+
+    # Same order and filtering as getintervals: by death simplex, drop zero
+    # persistence, then sort by lifespan
+    pairs.sort()
+    intervals = [(values[b], values[d]) for key, b, d in pairs if values[d]-values[b] > 0]
+    lifespan = [d-b for b, d in intervals]
+    int_id = np.array(lifespan).argsort(kind="stable")
+    intervals = np.array([intervals[i] for i in int_id])
+
+    return intervals
+
+def persistentcohomology(points, start, step, end, trial):
+    """
+    Compute the H1 homology intervals of a landmark point cloud with the
+    cohomology engine, as steps 3-6 of persistenthomology
+
+    Parameters
+    ----------
+    points : list[tuples], length: N
+        landmark points (see witnesscomplex)
+    start : float
+        smallest epsilon to use in Vietoris-Rips filtration computation
+    step : float
+        step size for epsilon to use in Vietoris-Rips filtration computation
+    end : float
+        largest epsilon to use in Vietoris-Rips filtration computation
+    trial : string
+        label of the data for presentation purposes
+
+    Returns
+    -------
+    intervals : array[floats], size: Kx2
+        array of the K homology intervals
+
+    """
+    print("---- COMPUTING PERSISTENT COHOMOLOGY: " + str(trial) + " ----")
+    tstart = time.perf_counter()
+    stats = {}
+    intervals = cohomologyintervals(landmarkdistances(points), start, step, end, stats)
+    texecute = time.perf_counter() - tstart
+    print("-> " + str(stats["edges"]) + " edges, " + str(stats["cleared"]) + " cleared, "
+          + str(stats["emergent"]) + " emergent pairs, " + str(stats["reduced"]) + " reduced columns")
+    print("-> coboundary matrix reduced in : " + str(texecute) + " sec")
+
+    return intervals
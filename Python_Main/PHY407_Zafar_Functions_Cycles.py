@@ -0,0 +1,239 @@
+"""
+Helper Functions - Gait-Cycle Segmentation
+PHY 407 - Gait Distinction via Hip-Knee Coordination
+Authors:
+        Abdullah Zafar, 999730411
+"""
+
+from PHY407_Zafar_Functions_Helper import normalize, gennormpoints
+from PHY407_Zafar_Functions_CRP import relphasediff
+from PHY407_Zafar_Functions_Topology import *
+from PHY407_Zafar_Functions_BatchHomology import batchpersistence
+import numpy as np
+
+def estimateperiod(signal):
+    """
+    Estimate the dominant period of a signal from the first peak of its
+    autocorrelation
+
+    Parameters
+    ----------
+    signal : array[float], size: Nx1
+        periodic signal, e.g. the hip angle
+
+    Returns
+    -------
+    period : int
+        estimated period in samples (len(signal) if no repetition is found)
+
+    """
+    x = signal - np.mean(signal)
+    n = len(x)
+    # Autocorrelation through the FFT, zero-padded to avoid wrap-around
+    f = np.fft.rfft(x, 2*n)
+    ac = np.fft.irfft(f*np.conj(f))[:n]
+    ac /= ac[0] if ac[0] > 0 else 1
+    # First lag after the autocorrelation turns negative, at its maximum
+    neg = np.where(ac < 0)[0]
+    if len(neg) == 0:
+        return n
+    lag = neg[0] + np.argmax(ac[neg[0]:])
+    period = int(lag) if ac[lag] > 0 else n
+
+    return period
+
+def detectcycles(raw, mincycle=None, prominence=0.5, column=0):
+    """
+    Detect gait-cycle boundaries as the maxima of the hip angle
+
+    Parameters
+    ----------
+    raw : array[float], size: Nx4
+        formatted data array (see continuousrelphase)
+    mincycle : int
+        shortest allowed cycle in samples (None --> half the estimated period)
+    prominence : float
+        a maximum must rise above the lowest value since the previous boundary
+        by this fraction of the signal range
+    column : int
+        column of raw to segment on (0 --> hip angle)
+
+    Returns
+    -------
+    boundaries : array[int]
+        sample index of each detected cycle boundary, in increasing order
+
+    """
+    h = raw[:,column]
+    n = len(h)
+    if mincycle is None:
+        mincycle = max(estimateperiod(h)//2, 1)
+    # Candidate local maxima
+    peaks = np.where((h[1:-1] > h[:-2]) & (h[1:-1] >= h[2:]))[0] + 1
+    # Non-maximum suppression: keep the highest peaks at least mincycle apart
+    keep = np.zeros(n, dtype=bool)
+    taken = np.zeros(n, dtype=bool)
+    for p in peaks[np.argsort(-h[peaks], kind="stable")]:
+        if not taken[p]:
+            keep[p] = True
+            taken[max(p-mincycle+1, 0):p+mincycle] = True
+    peaks = np.where(keep)[0]
+    # Drop peaks that do not rise enough above the preceding trough
+    depth = prominence*(np.max(h) - np.min(h))
+    boundaries = []
+    for p in peaks:
+        lo = boundaries[-1] if boundaries else 0
+        if h[p] - np.min(h[lo:p+1]) >= depth or not boundaries:
+            boundaries.append(p)
+    boundaries = np.array(boundaries, dtype=int)
+
+    return boundaries
+
+def segmentcycles(raw, boundaries, nsamples=200):
+    """
+    Cut a recording into cycles between consecutive boundaries and resample
+    every cycle to the same length, by linear interpolation
+
+    Parameters
+    ----------
+    raw : array[float], size: Nx4
+        formatted data array (see continuousrelphase)
+    boundaries : array[int]
+        sample index of each cycle boundary (see detectcycles)
+    nsamples : int
+        number of samples per resampled cycle
+
+    Returns
+    -------
+    cycles : array[float], size: CxSx4
+        C cycles of S = nsamples samples, each covering 0..100% of the cycle
+
+    """
+    b = np.asarray(boundaries)
+    if len(b) < 2:
+        return np.zeros((0, nsamples, raw.shape[1]))
+    # Fractional sample positions of every resampled point of every cycle
+    frac = np.arange(nsamples)/nsamples
+    t = b[:-1,None] + (b[1:]-b[:-1])[:,None]*frac[None,:]
+    i0 = np.floor(t).astype(int)
+    w = (t - i0)[:,:,None]
+    i1 = np.minimum(i0+1, len(raw)-1)
+    cycles = (1-w)*raw[i0] + w*raw[i1]
+
+    return cycles
+
+def cyclecrp(cycles):
+    """
+    Compute the continuous relative phase of every cycle at once, normalizing
+    each cycle's joint angles/velocities on its own range (as processphasespace
+    does for a whole file)
+
+    Parameters
+    ----------
+    cycles : array[float], size: CxSx4
+        resampled cycles (see segmentcycles)
+
+    Returns
+    -------
+    crp : array[float], size: CxS
+        continuous relative phase angle of each cycle
+    crpdot : array[float], size: CxS
+        continuous relative phase angular velocity of each cycle
+
+    """
+    N = [normalize(cycles[:,:,c], [cycles[:,:,c].min(axis=1, keepdims=True),
+                                   cycles[:,:,c].max(axis=1, keepdims=True)])
+         for c in range(4)]
+    crp = relphasediff(N[0], N[1], N[2], N[3])
+    crpdot = np.gradient(crp, axis=1)
+
+    return crp, crpdot
+
+def cyclepersistence(crp, crpdot, xrange, yrange, landmarks, start, step, end):
+    """
+    Compute the persistent homology of the CRP phase space of every cycle,
+    reducing the complexes of all cycles together (see batchpersistence)
+
+    Parameters
+    ----------
+    crp : array[float], size: CxS
+        continuous relative phase angle of each cycle
+    crpdot : array[float], size: CxS
+        continuous relative phase angular velocity of each cycle
+    xrange : list[float], length: 2
+        list of minimum/maximum values in x-values: [min(x), max(x)]
+    yrange : list[float], length: 2
+        list of minimum/maximum values in y-values: [min(y), max(y)]
+    landmarks : int
+        number of landmark points to use in witness complex construction
+    start : float
+        smallest epsilon to use in Vietoris-Rips filtration computation
+    step : float
+        step size for epsilon to use in Vietoris-Rips filtration computation
+    end : float
+        largest epsilon to use in Vietoris-Rips filtration computation
+
+    Returns
+    -------
+    intervals : list[array[floats]], length: C
+        list of the homology intervals of each cycle (see getintervals)
+
+    """
+    pointsL = [witnesscomplex(gennormpoints(crp[c], crpdot[c], xrange, yrange), landmarks)
+               for c in range(len(crp))]
+    intervals = batchpersistence(pointsL, start, step, end)
+
+    return intervals
+
+def cycleanalysis(raw, nsamples=200, landmarks=10, start=0, step=0.01, end=3, mincycle=None):
+    """
+    Segment a long recording into gait cycles and analyse all cycles in batch
+
+    Parameters
+    ----------
+    raw : array[float], size: Nx4
+        formatted data array (see continuousrelphase)
+    nsamples : int
+        number of samples per resampled cycle
+    landmarks : int
+        number of landmark points to use in witness complex construction
+    start : float
+        smallest epsilon to use in Vietoris-Rips filtration computation
+    step : float
+        step size for epsilon to use in Vietoris-Rips filtration computation
+    end : float
+        largest epsilon to use in Vietoris-Rips filtration computation
+    mincycle : int
+        shortest allowed cycle in samples (see detectcycles)
+
+    Returns
+    -------
+    boundaries : array[int]
+        sample index of each cycle boundary (first and last sample if fewer
+        than two were detected)
+    crp : array[float], size: CxS
+        continuous relative phase angle of each cycle
+    crpdot : array[float], size: CxS
+        continuous relative phase angular velocity of each cycle
+    intervals : list[array[floats]], length: C
+        homology intervals of each cycle, normalized over the range of all cycles
+
+    """
+    print("---- ---- ---- ---- ---- ---- ---- ---- ---- ----")
+    print("---- SEGMENTING GAIT CYCLES ----")
+    boundaries = detectcycles(raw, mincycle)
+    if len(boundaries) < 2:
+        # A recording of about one stride (like the Data/ trials) has at most
+        # one hip maximum: take the whole recording as its only cycle
+        print("-> no repeated cycle found, using the whole recording as one cycle")
+        boundaries = np.array([0, len(raw)-1])
+    cycles = segmentcycles(raw, boundaries, nsamples)
+    print("-> " + str(len(cycles)) + " cycles detected")
+    crp, crpdot = cyclecrp(cycles)
+    print("---- COMPUTING PERSISTENT HOMOLOGY OF ALL CYCLES ----")
+    intervals = []
+    if len(cycles):
+        intervals = cyclepersistence(crp, crpdot, [crp.min(), crp.max()], [crpdot.min(), crpdot.max()],
+                                     landmarks, start, step, end)
+
+    return boundaries, crp, crpdot, intervals
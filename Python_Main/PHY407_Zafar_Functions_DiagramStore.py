@@ -0,0 +1,264 @@
+"""
+Helper Functions - On-Disk Persistence Diagram Store
+PHY 407 - Gait Distinction via Hip-Knee Coordination
+Authors:
+        Abdullah Zafar, 999730411
+"""
+
+import numpy as np
+import json
+import os
+
+# Files making up a diagram store directory
+DIAGRAM_DATA = "diagrams.bin"
+DIAGRAM_INDEX = "index.jsonl"
+# Columns of each stored row: birth, death, homology dimension
+DIAGRAM_COLS = 3
+
+def creatediagramstore(path):
+    """
+    Create an empty diagram store
+
+    All diagrams are packed into one float array of (birth, death, dimension)
+    rows, and an index file holds one JSON line per diagram with its trial id,
+    row offset, row count and the parameters that produced it
+
+    Parameters
+    ----------
+    path : string
+        directory to create the store in
+
+    Returns
+    -------
+    store : dict
+        open store (see opendiagramstore)
+
+    """
+    os.makedirs(path, exist_ok=True)
+    if os.path.exists(os.path.join(path, DIAGRAM_INDEX)):
+        raise FileExistsError("diagram store already exists: " + str(path))
+    for name in (DIAGRAM_DATA, DIAGRAM_INDEX):
+        open(os.path.join(path, name), "wb").close()
+
+    return opendiagramstore(path)
+
+def opendiagramstore(path):
+    """
+    Open a diagram store, recovering from an interrupted append: index lines
+    that are incomplete or point past the data are dropped, and data rows not
+    covered by the index are discarded
+
+    Parameters
+    ----------
+    path : string
+        store directory
+
+    Returns
+    -------
+    store : dict
+        'path' --> store directory
+        'index' --> dict{string: dict}, index entry of each trial id
+            --> a trial appended more than once maps to its latest entry
+        'rows' --> number of committed data rows
+        'indexbytes' --> size in bytes of the committed index lines
+        'data' --> memory map of the data rows (None until first read)
+
+    """
+    datafile = os.path.join(path, DIAGRAM_DATA)
+    indexfile = os.path.join(path, DIAGRAM_INDEX)
+    nrows = os.path.getsize(datafile) // (8*DIAGRAM_COLS)
+
+    index = {}
+    rows = 0
+    valid = 0 # number of bytes of valid index lines
+    with open(indexfile, "rb") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break
+            if not line.endswith(b"\n") or entry["offset"] + entry["count"] > nrows:
+                break
+            index[entry["trial"]] = entry
+            rows = max(rows, entry["offset"] + entry["count"])
+            valid += len(line)
+    # Drop anything written after the last committed append
+    with open(indexfile, "r+b") as f:
+        f.truncate(valid)
+    with open(datafile, "r+b") as f:
+        f.truncate(8*DIAGRAM_COLS*rows)
+    store = {"path": path, "index": index, "rows": rows, "indexbytes": valid, "data": None}
+
+    return store
+
+def appenddiagram(store, trial, intervals, params, dim=1):
+    """
+    Append the homology intervals of a trial to the store
+
+    The rows are written and synced before the index line that refers to them,
+    so a crash at any point leaves the store readable with every earlier append.
+    Both files are first cut back to their committed size, so bytes left by
+    an earlier append that failed part way never shift the new rows
+
+    Parameters
+    ----------
+    store : dict
+        open diagram store
+    trial : string
+        trial id
+    intervals : array[float], size: Kx2 or Kx3
+        homology intervals (see getintervals), or (birth, death, dimension) rows
+    params : dict
+        parameters that produced the diagram (e.g. nlandmarks, start, step, end)
+    dim : int
+        homology dimension of the intervals, if intervals has 2 columns
+
+    Returns
+    -------
+    entry : dict
+        index entry of the appended diagram
+
+    """
+    rows = np.asarray(intervals, dtype=np.float64)
+    if rows.size == 0:
+        rows = rows.reshape(0,2)
+    if rows.shape[1] == 2:
+        rows = np.hstack((rows, np.full((len(rows),1), float(dim))))
+    entry = {"trial": str(trial), "offset": store["rows"], "count": len(rows), "params": params}
+    line = (json.dumps(entry) + "\n").encode()
+
+    with open(os.path.join(store["path"], DIAGRAM_DATA), "r+b") as f:
+        f.truncate(8*DIAGRAM_COLS*store["rows"])
+        f.seek(8*DIAGRAM_COLS*store["rows"])
+        f.write(np.ascontiguousarray(rows).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    with open(os.path.join(store["path"], DIAGRAM_INDEX), "r+b") as f:
+        f.truncate(store["indexbytes"])
+        f.seek(store["indexbytes"])
+        f.write(line)
+        f.flush()
+        os.fsync(f.fileno())
+    store["index"][entry["trial"]] = entry
+    store["rows"] += len(rows)
+    store["indexbytes"] += len(line)
+    store["data"] = None
+
+    return entry
+
+def storedata(store):
+    """
+    Get the memory-mapped data rows of the store
+
+    Parameters
+    ----------
+    store : dict
+        open diagram store
+
+    Returns
+    -------
+    data : array[float], size: Rx3
+        memory map of all committed (birth, death, dimension) rows
+
+    """
+    if store["data"] is None:
+        if store["rows"] == 0:
+            return np.zeros((0, DIAGRAM_COLS))
+        store["data"] = np.memmap(os.path.join(store["path"], DIAGRAM_DATA), dtype=np.float64,
+                                  mode="r", shape=(store["rows"], DIAGRAM_COLS))
+
+    return store["data"]
+
+def readdiagram(store, trial):
+    """
+    Read the diagram of one trial without loading the rest of the store
+
+    Parameters
+    ----------
+    store : dict
+        open diagram store
+    trial : string
+        trial id
+
+    Returns
+    -------
+    diagram : array[float], size: Kx3
+        read-only view of the (birth, death, dimension) rows of the trial
+
+    """
+    entry = store["index"][str(trial)]
+    diagram = storedata(store)[entry["offset"]:entry["offset"]+entry["count"]]
+
+    return diagram
+
+def readintervals(store, trial, dim=1):
+    """
+    Read the homology intervals of one dimension of a trial, in the Kx2 format
+    returned by getintervals
+
+    Parameters
+    ----------
+    store : dict
+        open diagram store
+    trial : string
+        trial id
+    dim : int
+        homology dimension
+
+    Returns
+    -------
+    intervals : array[float], size: Kx2
+        array of the K homology intervals, in stored order
+            --> column 1: formation of hole, column 2: closure of hole
+
+    """
+    diagram = readdiagram(store, trial)
+    intervals = np.array(diagram[diagram[:,2]==dim, :2])
+
+    return intervals
+
+def loadintervals(store, trials=None, dim=1):
+    """
+    Read the homology intervals of a subset of trials, e.g. to pass to wassersteindist
+
+    Parameters
+    ----------
+    store : dict
+        open diagram store
+    trials : list[string]
+        trial ids to read (None --> all trials, in order of first append)
+    dim : int
+        homology dimension
+
+    Returns
+    -------
+    intervals : list[array[float]], length: N
+        list of N homology intervals
+
+    """
+    if trials is None:
+        trials = list(store["index"])
+    intervals = [readintervals(store, t, dim) for t in trials]
+
+    return intervals
+
+def diagramparams(store, trial):
+    """
+    Get the parameters that produced the diagram of a trial
+
+    Parameters
+    ----------
+    store : dict
+        open diagram store
+    trial : string
+        trial id
+
+    Returns
+    -------
+    params : dict
+        parameters recorded by appenddiagram
+
+    """
+    params = store["index"][str(trial)]["params"]
+
+    return params
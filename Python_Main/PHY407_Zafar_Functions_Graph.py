@@ -0,0 +1,396 @@
+"""
+Helper Functions - Sparse k-Nearest-Neighbour Graph Clustering
+PHY 407 - Gait Distinction via Hip-Knee Coordination
+Authors:
+        Abdullah Zafar, 999730411
+"""
+
+import numpy as np
+
+def knngraph(rows, n, knn, block=1024):
+    """
+    Build a symmetric k-nearest-neighbour graph in compressed sparse row form,
+    never holding more than one block of distance rows at a time
+
+    Parameters
+    ----------
+    rows : matrix[float] or function
+        NxN distance matrix (dense or memory-mapped), or a function
+        rows(i0, i1) returning the (i1-i0)xN block of distance rows i0..i1-1
+    n : int
+        number of trials N
+    knn : int
+        number of nearest neighbours to keep for each trial
+    block : int
+        number of distance rows to process at once
+
+    Returns
+    -------
+    graph : tuple(array[int], array[int], array[float])
+        (indptr, indices, weights) of the symmetric graph
+            --> the neighbours of trial i are indices[indptr[i]:indptr[i+1]]
+            --> weights are the distances of the edges
+
+    """
+    if not callable(rows):
+        M = rows
+        rows = lambda i0, i1: np.asarray(M[i0:i1])
+    knn = min(knn, n-1)
+    src = []
+    dst = []
+    dist = []
+    for i0 in range(0, n, block):
+        i1 = min(i0+block, n)
+        R = np.array(rows(i0, i1), dtype=np.float64)
+        # Exclude each trial from its own neighbours
+        R[np.arange(i1-i0), np.arange(i0, i1)] = np.inf
+        idx = np.argpartition(R, knn-1, axis=1)[:,:knn]
+        src.append(np.repeat(np.arange(i0, i1), knn))
+        dst.append(idx.ravel())
+        dist.append(np.take_along_axis(R, idx, axis=1).ravel())
+    src = np.concatenate(src)
+    dst = np.concatenate(dst)
+    dist = np.concatenate(dist)
+
+    # Symmetrize: keep every edge in both directions once
+    a = np.concatenate((src, dst))
+    b = np.concatenate((dst, src))
+    w = np.concatenate((dist, dist))
+    key = np.unique(a.astype(np.int64)*n + b, return_index=True)[1]
+    a, b, w = a[key], b[key], w[key]
+    indptr = np.zeros(n+1, dtype=np.int64)
+    np.cumsum(np.bincount(a, minlength=n), out=indptr[1:])
+    graph = (indptr, b, w)
+
+    return graph
+
+def graphedges(graph):
+    """
+    List each undirected edge of a sparse graph once
+
+    Parameters
+    ----------
+    graph : tuple(array[int], array[int], array[float])
+        sparse graph (see knngraph)
+
+    Returns
+    -------
+    src : array[int]
+        first trial of each edge
+    dst : array[int]
+        second trial of each edge (src < dst)
+    w : array[float]
+        weight of each edge
+
+    """
+    indptr, indices, weights = graph
+    a = np.repeat(np.arange(len(indptr)-1), np.diff(indptr))
+    keep = a < indices
+    src, dst, w = a[keep], indices[keep], weights[keep]
+
+    return src, dst, w
+
+def compressroots(parent):
+    """
+    Point every element of a union-find forest directly at its root, by
+    pointer jumping over the whole parent array
+
+    Parameters
+    ----------
+    parent : array[int]
+        union-find parent array
+
+    Returns
+    -------
+    parent : array[int]
+        parent array where parent[x] is the root of x
+
+    """
+    while True:
+        up = parent[parent]
+        if np.array_equal(up, parent):
+            break
+        parent = up
+
+    return parent
+
+def connectedcomponents(graph, thresh=np.inf):
+    """
+    Label the connected components of a sparse graph, keeping only edges
+    shorter than a threshold
+
+    Parameters
+    ----------
+    graph : tuple(array[int], array[int], array[float])
+        sparse graph (see knngraph)
+    thresh : float
+        keep edges with weight < thresh
+
+    Returns
+    -------
+    labels : array[int], size: N
+        component label of each trial, numbered 0,1,... by first appearance
+
+    """
+    n = len(graph[0]) - 1
+    src, dst, w = graphedges(graph)
+    keep = w < thresh
+    src, dst = src[keep], dst[keep]
+    parent = np.arange(n)
+    # Vectorized union-find: hook roots onto the smaller root, then compress,
+    # until every edge joins two elements with the same root
+    while len(src):
+        ra = parent[src]
+        rb = parent[dst]
+        diff = ra != rb
+        if not np.any(diff):
+            break
+        src, dst = src[diff], dst[diff]
+        lo = np.minimum(ra[diff], rb[diff])
+        hi = np.maximum(ra[diff], rb[diff])
+        np.minimum.at(parent, hi, lo)
+        parent = compressroots(parent)
+    labels = np.unique(parent, return_inverse=True)[1]
+
+    return labels
+
+def singlelinkage(graph, nclusters=None, thresh=None):
+    """
+    Single-linkage hierarchical clustering on a sparse graph, from the minimum
+    spanning forest (Kruskal's algorithm)
+
+    Parameters
+    ----------
+    graph : tuple(array[int], array[int], array[float])
+        sparse graph (see knngraph)
+    nclusters : int
+        cut the hierarchy into this many clusters (if the graph is connected enough)
+    thresh : float
+        cut the hierarchy at this merge distance (used if nclusters is None)
+
+    Returns
+    -------
+    labels : array[int], size: N
+        cluster label of each trial
+    merges : array[float], size: Mx3
+        (trial a, trial b, distance) of each spanning-forest edge, by distance
+
+    """
+    n = len(graph[0]) - 1
+    src, dst, w = graphedges(graph)
+    order = np.argsort(w, kind="stable")
+    parent = list(range(n))
+
+    def root(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    merges = []
+    for e in order:
+        ra = root(src[e])
+        rb = root(dst[e])
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+            merges.append((src[e], dst[e], w[e]))
+    merges = np.array(merges, dtype=np.float64).reshape(-1, 3)
+
+    # Cut the forest: drop its longest edges
+    if nclusters is not None:
+        keep = merges[:max(n-nclusters, 0)]
+    elif thresh is not None:
+        keep = merges[merges[:,2] < thresh]
+    else:
+        keep = merges
+    tree = symmetricgraph(n, keep[:,0].astype(np.int64), keep[:,1].astype(np.int64), keep[:,2])
+    labels = connectedcomponents(tree)
+
+    return labels, merges
+
+def symmetricgraph(n, a, b, w):
+    """
+    Build a sparse graph from a list of undirected edges
+
+    Parameters
+    ----------
+    n : int
+        number of trials
+    a : array[int]
+        first trial of each edge
+    b : array[int]
+        second trial of each edge
+    w : array[float]
+        weight of each edge
+
+    Returns
+    -------
+    graph : tuple(array[int], array[int], array[float])
+        sparse graph (see knngraph)
+
+    """
+    src = np.concatenate((a, b))
+    dst = np.concatenate((b, a))
+    wt = np.concatenate((w, w))
+    order = np.argsort(src, kind="stable")
+    indptr = np.zeros(n+1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+    graph = (indptr, dst[order], wt[order])
+
+    return graph
+
+def sparsematvec(graph, values, X):
+    """
+    Multiply the sparse matrix with the given edge values by a dense matrix
+
+    Parameters
+    ----------
+    graph : tuple(array[int], array[int], array[float])
+        sparse graph (see knngraph)
+    values : array[float]
+        matrix entry of each stored edge
+    X : matrix[float], size: NxD
+        dense matrix
+
+    Returns
+    -------
+    Y : matrix[float], size: NxD
+        product of the sparse matrix with X
+
+    """
+    indptr, indices, weights = graph
+    n = len(indptr) - 1
+    rows = np.repeat(np.arange(n), np.diff(indptr))
+    Y = np.zeros(X.shape)
+    # One column at a time, so memory stays linear in the number of edges
+    for c in range(X.shape[1]):
+        Y[:,c] = np.bincount(rows, weights=values*X[indices,c], minlength=n)
+
+    return Y
+
+def spectralclusters(graph, nclusters, sigma=None, ncols=400, nrestart=10, tol=1e-6, niter=100, seed=1):
+    """
+    Spectral clustering on a sparse graph: embed the trials with the leading
+    eigenvectors of the normalized affinity matrix (by block Krylov iteration)
+    and group the embedding with k-means
+
+    Parameters
+    ----------
+    graph : tuple(array[int], array[int], array[float])
+        sparse graph (see knngraph)
+    nclusters : int
+        number of clusters
+    sigma : float
+        width of the Gaussian affinity exp(-d^2/sigma^2) (None --> median edge length)
+    ncols : int
+        largest number of Krylov basis vectors to hold (memory is N x ncols)
+    nrestart : int
+        largest number of Krylov restarts
+    tol : float
+        stop restarting once the leading Ritz values change by less than tol
+    niter : int
+        largest number of k-means iterations
+    seed : int
+        seed for the random start
+
+    Returns
+    -------
+    labels : array[int], size: N
+        cluster label of each trial
+
+    """
+    indptr, indices, weights = graph
+    n = len(indptr) - 1
+    rows = np.repeat(np.arange(n), np.diff(indptr))
+    if sigma is None:
+        sigma = np.median(weights) if len(weights) else 1.0
+    sigma = max(sigma, 1e-12)
+    aff = np.exp(-(weights/sigma)**2)
+    deg = np.bincount(rows, weights=aff, minlength=n) + 1e-12
+    # Normalized affinity D^-1/2 S D^-1/2
+    values = aff / np.sqrt(deg[rows]*deg[indices])
+
+    # Restarted block Krylov iteration: build [X, MX, M^2X, ...] with full
+    # reorthogonalization, keep the leading Ritz vectors and restart from them;
+    # unlike power iteration this converges when several eigenvalues sit close
+    # to 1, as they do for well-separated groups
+    rng = np.random.default_rng(seed)
+    nblock = min(2*nclusters+8, n)
+    X, R = np.linalg.qr(rng.standard_normal((n, nblock)))
+    ritz = np.zeros(nclusters)
+    for restart in range(nrestart):
+        basis = [X]
+        for it in range(max(ncols // nblock, 2) - 1):
+            X = sparsematvec(graph, values, X)
+            for rep in range(2):
+                for B in basis:
+                    X -= B @ (B.transpose() @ X)
+            X, R = np.linalg.qr(X)
+            basis.append(X)
+        Q = np.hstack(basis)
+        H = np.hstack([Q.transpose() @ sparsematvec(graph, values, B) for B in basis])
+        evals, evecs = np.linalg.eigh((H + H.transpose())/2)
+        X = Q @ evecs[:,::-1][:,:nblock]
+        converged = np.allclose(evals[::-1][:nclusters], ritz, rtol=0, atol=tol)
+        ritz = evals[::-1][:nclusters]
+        if converged:
+            break
+    X = X[:,:nclusters]
+    # Row-normalize the embedding
+    X /= np.linalg.norm(X, axis=1, keepdims=True) + 1e-12
+
+    labels = kmeans(X, nclusters, niter, seed)
+
+    return labels
+
+def kmeans(X, nclusters, niter=100, seed=1, nrepeat=5):
+    """
+    Group the rows of X with k-means, seeded with k-means++ and repeated,
+    keeping the grouping with the smallest within-cluster sum of squares
+
+    Parameters
+    ----------
+    X : matrix[float], size: NxD
+        points to group
+    nclusters : int
+        number of clusters
+    niter : int
+        largest number of iterations per repeat
+    seed : int
+        seed for the random initialization
+    nrepeat : int
+        number of random initializations
+
+    Returns
+    -------
+    labels : array[int], size: N
+        cluster label of each point
+
+    """
+    rng = np.random.default_rng(seed)
+    n = len(X)
+    best = np.inf
+    for rep in range(nrepeat):
+        # k-means++: pick each new center with probability ~ squared distance
+        centers = [X[rng.integers(n)]]
+        d = np.sum((X-centers[0])**2, axis=1)
+        for c in range(1, nclusters):
+            centers.append(X[rng.choice(n, p=d/d.sum()) if d.sum() > 0 else rng.integers(n)])
+            d = np.minimum(d, np.sum((X-centers[-1])**2, axis=1))
+        centers = np.array(centers)
+        lab = np.zeros(n, dtype=int)
+        for it in range(niter):
+            dist = ((X[:,None,:] - centers[None,:,:])**2).sum(axis=2)
+            new = np.argmin(dist, axis=1)
+            if it and np.array_equal(new, lab):
+                break
+            lab = new
+            for c in range(nclusters):
+                if np.any(lab == c):
+                    centers[c] = X[lab == c].mean(axis=0)
+        inertia = np.sum((X - centers[lab])**2)
+        if inertia < best:
+            best = inertia
+            labels = lab
+
+    return labels
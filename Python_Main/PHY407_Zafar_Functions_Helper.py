@@ -82,4 +82,39 @@ def gennormpoints(x,y,xrange,yrange):
     for i in range(len(x)):
         points.append((xN[i],yN[i]))
         
-    return points
\ No newline at end of file
+    return points
+
+def importfootprint(module):
+    """
+    Measure the cost of importing a module in a fresh interpreter, as paid by
+    every newly spawned worker process
+
+    Parameters
+    ----------
+    module : string
+        name of the module to import
+
+    Returns
+    -------
+    footprint : dict
+        'seconds' --> wall time of the import
+        'maxrss_kb' --> peak resident memory of the interpreter after the import
+        'matplotlib' --> True if the import loaded matplotlib
+
+    """
+    import subprocess
+    import sys
+    import os
+
+    code = ("import time, resource, sys\n"
+            "t = time.perf_counter()\n"
+            "import " + module + "\n"
+            "t = time.perf_counter() - t\n"
+            "print(t, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,"
+            " 'matplotlib' in sys.modules)")
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                         check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    seconds, rss, mpl = out.stdout.split()
+    footprint = {"seconds": float(seconds), "maxrss_kb": int(rss), "matplotlib": mpl == "True"}
+
+    return footprint
\ No newline at end of file
@@ -0,0 +1,276 @@
+"""
+Helper Functions - Incremental Distance Matrix
+PHY 407 - Gait Distinction via Hip-Knee Coordination
+Authors:
+        Abdullah Zafar, 999730411
+"""
+
+from PHY407_Zafar_Functions_Wasserstein import wassersteinpair
+from PHY407_Zafar_Functions_DiagramStore import *
+import numpy as np
+import json
+import os
+
+# Files making up a distance store directory
+STORE_META = "meta.json"
+STORE_DIST = "dist.bin"
+STORE_DIAGRAMS = "diagrams"
+
+def createdistancestore(path, k):
+    """
+    Create an empty on-disk distance store
+
+    The matrix is kept as its lower triangle, appended row by row: row i holds
+    the i distances from trial i to trials 0..i-1 and starts at element i(i-1)/2,
+    so adding trial N only appends N values and never moves existing data
+
+    Parameters
+    ----------
+    path : string
+        directory to create the store in
+    k : int
+        number of homology intervals to consider for distance computation
+
+    Returns
+    -------
+    store : dict
+        open store (see opendistancestore)
+
+    """
+    os.makedirs(path, exist_ok=True)
+    if os.path.exists(os.path.join(path, STORE_META)):
+        raise FileExistsError("distance store already exists: " + str(path))
+    open(os.path.join(path, STORE_DIST), "wb").close()
+    creatediagramstore(os.path.join(path, STORE_DIAGRAMS))
+    writemeta(path, {"k": k, "labels": [], "max": 0.0})
+
+    return opendistancestore(path)
+
+def writemeta(path, meta):
+    """
+    Atomically replace the metadata of a distance store; this is the commit
+    point of every append
+
+    Parameters
+    ----------
+    path : string
+        store directory
+    meta : dict
+        store metadata
+
+    Returns
+    -------
+    None.
+
+    """
+    tmp = os.path.join(path, STORE_META + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(meta, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(path, STORE_META))
+
+def opendistancestore(path):
+    """
+    Open a distance store, discarding any partially written append
+
+    Parameters
+    ----------
+    path : string
+        store directory
+
+    Returns
+    -------
+    store : dict
+        'path' --> store directory
+        'meta' --> store metadata: k, labels, maximum distance
+        'diagrams' --> diagram store of the k longest intervals of each trial
+
+    """
+    with open(os.path.join(path, STORE_META)) as f:
+        meta = json.load(f)
+    n = len(meta["labels"])
+    # Drop data written after the last committed append
+    with open(os.path.join(path, STORE_DIST), "r+b") as f:
+        f.truncate(8*(n*(n-1)//2))
+    store = {"path": path, "meta": meta,
+             "diagrams": opendiagramstore(os.path.join(path, STORE_DIAGRAMS))}
+
+    return store
+
+def storediagrams(store):
+    """
+    Get the stored (k longest) homology intervals of every trial
+
+    Parameters
+    ----------
+    store : dict
+        open distance store
+
+    Returns
+    -------
+    diagrams : list[array[float]], length: N
+        list of Kx2 interval arrays
+
+    """
+    n = len(store["meta"]["labels"])
+    diagrams = loadintervals(store["diagrams"], [str(i) for i in range(n)])
+
+    return diagrams
+
+def appendtrial(store, intervals, label):
+    """
+    Add a trial to the store by computing only its distances to the N stored
+    trials, i.e. O(N) Wasserstein distances
+
+    Parameters
+    ----------
+    store : dict
+        open distance store
+    intervals : array[float], size: Kx2
+        homology intervals of the new trial (see getintervals; may be empty)
+    label : string
+        label of the new trial
+
+    Returns
+    -------
+    row : array[float], size: N
+        Wasserstein distances from the new trial to the stored trials
+
+    """
+    meta = store["meta"]
+    path = store["path"]
+    B = np.asarray(intervals, dtype=np.float64).reshape(-1, 2)[-meta["k"]:,:]
+    # Older trial first, matching the (a<b) order of wassersteindist
+    row = np.array([wassersteinpair(D, B) for D in storediagrams(store)])
+
+    # Append data first, then commit by replacing the metadata; an uncommitted
+    # diagram is simply replaced by the next append under the same index, and
+    # uncommitted distances are cut off before writing
+    n = len(meta["labels"])
+    appenddiagram(store["diagrams"], str(n), B, {"k": meta["k"], "label": str(label)})
+    with open(os.path.join(path, STORE_DIST), "r+b") as f:
+        f.truncate(8*(n*(n-1)//2))
+        f.seek(8*(n*(n-1)//2))
+        f.write(np.ascontiguousarray(row, dtype=np.float64).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    meta = dict(meta)
+    meta["labels"] = meta["labels"] + [str(label)]
+    if len(row):
+        meta["max"] = max(meta["max"], float(row.max()))
+    writemeta(path, meta)
+    store["meta"] = meta
+
+    return row
+
+def distancerow(store, i, normalize=False):
+    """
+    Get all distances from one stored trial, reading O(N) values
+
+    Parameters
+    ----------
+    store : dict
+        open distance store
+    i : int
+        index of the trial
+    normalize : boolean
+        True --> divide by the largest distance in the store
+
+    Returns
+    -------
+    row : array[float], size: N
+        distances from trial i to every stored trial
+
+    """
+    n = len(store["meta"]["labels"])
+    row = np.zeros(n)
+    if n > 1:
+        tri = np.memmap(os.path.join(store["path"], STORE_DIST), dtype=np.float64, mode="r")
+        # Lower part: row i of the triangle; upper part: column i of later rows
+        row[:i] = tri[i*(i-1)//2:i*(i-1)//2+i]
+        j = np.arange(i+1, n)
+        row[i+1:] = tri[j*(j-1)//2+i]
+    if normalize and store["meta"]["max"] > 0:
+        row /= store["meta"]["max"]
+
+    return row
+
+def distancematrix(store, normalize=False):
+    """
+    Assemble the full symmetric distance matrix of the store
+
+    Parameters
+    ----------
+    store : dict
+        open distance store
+    normalize : boolean
+        True --> divide by the largest distance in the store
+
+    Returns
+    -------
+    W : matrix[float], size: NxN
+        Wasserstein distance matrix
+
+    """
+    n = len(store["meta"]["labels"])
+    W = np.zeros((n,n))
+    if n > 1:
+        tri = np.memmap(os.path.join(store["path"], STORE_DIST), dtype=np.float64, mode="r")
+        W[np.tril_indices(n, -1)] = tri
+        W += W.transpose()
+    if normalize and store["meta"]["max"] > 0:
+        W /= store["meta"]["max"]
+
+    return W
+
+def adjacencyrow(store, i, A_thresh):
+    """
+    Get one row of the thresholded adjacency matrix, normalized by the current
+    largest distance at the time of the call
+
+    Parameters
+    ----------
+    store : dict
+        open distance store
+    i : int
+        index of the trial
+    A_thresh : float
+        adjacency threshold on normalized distances
+
+    Returns
+    -------
+    A : array[float], size: N
+        1 where trial i is adjacent to a trial, 0 otherwise
+
+    """
+    W = distancerow(store, i, normalize=True)
+    A = np.zeros(len(W))
+    A[W<A_thresh] = 1
+    A[i] = 0
+
+    return A
+
+def adjacencymatrix(store, A_thresh):
+    """
+    Get the thresholded adjacency matrix of the store, as MainProgram computes it
+
+    Parameters
+    ----------
+    store : dict
+        open distance store
+    A_thresh : float
+        adjacency threshold on normalized distances
+
+    Returns
+    -------
+    A : matrix[float], size: NxN
+        adjacency matrix
+
+    """
+    W = distancematrix(store, normalize=True)
+    A = np.zeros((len(W),len(W)))
+    A[W<A_thresh] = 1
+    np.fill_diagonal(A, 0)
+
+    return A
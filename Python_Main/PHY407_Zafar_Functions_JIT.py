@@ -0,0 +1,215 @@
+"""
+Helper Functions - Optional JIT-Compiled Kernels
+PHY 407 - Gait Distinction via Hip-Knee Coordination
+Authors:
+        Abdullah Zafar, 999730411
+"""
+
+import numpy as np
+import time
+import os
+
+# The kernels are compiled with numba when it is installed (and PHY407_NOJIT
+# is not set); otherwise JIT_AVAILABLE is False and the callers keep their
+# NumPy implementations
+try:
+    if os.environ.get("PHY407_NOJIT"):
+        raise ImportError("JIT disabled by PHY407_NOJIT")
+    from numba import njit
+    JIT_AVAILABLE = True
+except ImportError:
+    JIT_AVAILABLE = False
+
+def jitkernel(func):
+    """
+    Compile a scalar kernel, caching the machine code on disk so that later
+    processes (e.g. pool workers) load it instead of compiling again
+
+    Parameters
+    ----------
+    func : function
+        kernel written with scalar loops over NumPy arrays
+
+    Returns
+    -------
+    kernel : function
+        compiled kernel (func itself if numba is not available)
+
+    """
+    if JIT_AVAILABLE:
+        return njit(cache=True, nogil=True)(func)
+
+    return func
+
+@jitkernel
+def lowestone(col, top):
+    """
+    Lowest nonzero row of a 0/1 column at or above row top (-1 if none)
+    """
+    for i in range(top, -1, -1):
+        if col[i]:
+            return i
+    return -1
+
+@jitkernel
+def reducekernel(RT):
+    """
+    Standard algorithm on a 0/1 boundary matrix, stored transposed so that
+    each column is a contiguous row of RT (reduced in place)
+
+    Parameters
+    ----------
+    RT : matrix[uint8], size: KxK
+        transposed boundary matrix
+
+    Returns
+    -------
+    pivots : array[int], size: K
+        pivot row of each reduced column (-1 for zero columns)
+
+    """
+    K = RT.shape[0]
+    lookup = np.full(K, -1, dtype=np.int64) # pivot row --> column owning it
+    pivots = np.full(K, -1, dtype=np.int64)
+    for j in range(K):
+        p = lowestone(RT[j], K-1)
+        while p >= 0 and lookup[p] >= 0:
+            o = lookup[p]
+            for i in range(p+1):
+                RT[j,i] ^= RT[o,i]
+            p = lowestone(RT[j], p)
+        pivots[j] = p
+        if p >= 0:
+            lookup[p] = j
+
+    return pivots
+
+@jitkernel
+def assignmentkernel(D):
+    """
+    Shortest augmenting path assignment with scalar loops, the same steps
+    (and floating point operations) as optimalassignment
+
+    Parameters
+    ----------
+    D : matrix[float], size: KxK
+        square cost matrix
+
+    Returns
+    -------
+    A : array[int], K
+        column paired with each row
+
+    """
+    n = D.shape[0]
+    u = np.zeros(n+1)
+    v = np.zeros(n+1)
+    p = np.zeros(n+1, dtype=np.int64)
+    way = np.zeros(n+1, dtype=np.int64)
+    minv = np.empty(n+1)
+    used = np.empty(n+1, dtype=np.bool_)
+    for i in range(1, n+1):
+        p[0] = i
+        j0 = 0
+        minv[:] = np.inf
+        used[:] = False
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            j1 = -1
+            for j in range(1, n+1):
+                if not used[j]:
+                    cur = D[i0-1,j-1] - u[i0] - v[j]
+                    if cur < minv[j]:
+                        minv[j] = cur
+                        way[j] = j0
+                    # First free column with the smallest minv, as np.argmin
+                    if j1 == -1 or minv[j] < minv[j1]:
+                        j1 = j
+            delta = minv[j1]
+            for j in range(n+1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    A = np.zeros(n, dtype=np.int64)
+    for j in range(1, n+1):
+        A[p[j]-1] = j-1
+
+    return A
+
+@jitkernel
+def maxminkernel(P, first, nland):
+    """
+    Greedy max-min landmark selection with scalar loops, the same choices as
+    witnesscomplex
+
+    Parameters
+    ----------
+    P : matrix[float], size: Nx2
+        point cloud
+    first : int
+        index of the first landmark
+    nland : int
+        number of landmarks
+
+    Returns
+    -------
+    L : array[int], size: nland
+        index of each landmark, in order of selection
+
+    """
+    N = P.shape[0]
+    L = np.zeros(nland, dtype=np.int64)
+    island = np.zeros(N, dtype=np.bool_)
+    mind = np.full(N, np.inf)
+    L[0] = first
+    island[first] = True
+    for c in range(1, nland):
+        # Fold the newest landmark into each point's minimum distance
+        last = L[c-1]
+        best = -1
+        bestd = 0.0
+        for p in range(N):
+            d = np.sqrt((P[p,0]-P[last,0])**2 + (P[p,1]-P[last,1])**2)
+            if d < mind[p]:
+                mind[p] = d
+            m = -1.0 if island[p] else mind[p]
+            # First index of the largest value, as np.argmax
+            if best == -1 or m > bestd:
+                best = p
+                bestd = m
+        L[c] = best
+        island[best] = True
+
+    return L
+
+def warmup():
+    """
+    Compile (or load from the on-disk cache) every kernel on a tiny input, so
+    that the first real call, and worker processes started later, do not pay
+    for compilation
+
+    Returns
+    -------
+    seconds : float
+        time spent (0 if numba is not available)
+
+    """
+    if not JIT_AVAILABLE:
+        return 0.0
+    tstart = time.perf_counter()
+    reducekernel(np.eye(3, k=1, dtype=np.uint8))
+    assignmentkernel(np.ones((2, 2)))
+    maxminkernel(np.zeros((3, 2)), 0, 2)
+
+    return time.perf_counter() - tstart
@@ -5,10 +5,11 @@ Authors:
         Abdullah Zafar, 999730411
 """
 from PHY407_Zafar_Functions_Helper import *
-from PHY407_Zafar_Functions_Plot import *
 from PHY407_Zafar_Functions_CRP import *
 from PHY407_Zafar_Functions_Topology import *
 from PHY407_Zafar_Functions_Wasserstein import *
+from PHY407_Zafar_Functions_Cohomology import landmarkdistances
+from PHY407_Zafar_Functions_Sinkhorn import sinkhorndist
 import numpy as np
 import time
 
@@ -48,7 +49,7 @@ def continuousrelphase(raw, trial):
     
     return crp, crpdot
 
-def persistenthomology(x, y, xrange, yrange, landmarks, start, step, end, pltWitComp, trial):
+def persistenthomology(x, y, xrange, yrange, landmarks, start, step, end, pltWitComp, trial, nworkers=None, nu=None, topk=None, strict=False):
     """
     Main function to compute the persistent homology of a point cloud
 
@@ -74,6 +75,21 @@ def persistenthomology(x, y, xrange, yrange, landmarks, start, step, end, pltWit
         True --> plot witness complex
     trial : string
         label of the data for presentation purposes
+    nworkers : int
+        None --> reduce the boundary matrix with the sequential standard algorithm
+        N --> reduce it on N worker processes (see reduceboundarymatparallel)
+    nu : int
+        None --> Vietoris-Rips filtration of the landmarks
+        0, 1 or 2 --> lazy witness filtration using every point as a witness (see lazywitness)
+    topk : int
+        None --> build and reduce the whole filtration
+        k --> stop once the k longest intervals are final (see adaptivepersistence);
+              shorter intervals may be missing (needs strict=True)
+    strict : boolean
+        boundary matrix convention (see createboundarymat)
+        False --> the original analysis
+        True --> the standard boundary matrix; the last topk rows then equal
+                 those of the full computation with strict=True
 
     Returns
     -------
@@ -83,6 +99,9 @@ def persistenthomology(x, y, xrange, yrange, landmarks, start, step, end, pltWit
             --> column 1: formation of hole, column 2: closure of hole
 
     """
+    if topk is not None and not strict:
+        # No death can be bounded early under the original face rule
+        raise ValueError("topk needs the standard boundary matrix: pass strict=True")
     print("---- ---- ---- ---- ---- ---- ---- ---- ---- ----")
     print("---- COMPUTING PERSISTENT HOMOLOGY: " + str(trial) + " ----")
     
@@ -93,22 +112,46 @@ def persistenthomology(x, y, xrange, yrange, landmarks, start, step, end, pltWit
     # 2. Approximate point cloud with witness complex
     print("2. Producing Witness Complex")
     pointsL = witnesscomplex(points, landmarks)
+    nearest = None
+    if nu is not None:
+        # One pass over the witnesses serves both the filtration and the plot
+        E, nearest = lazywitness(points, pointsL, nu)
     # Plot Witness Complex
     if pltWitComp:
-        plotwitcomplex(points, pointsL, D, trial)
+        # Plotting is loaded on demand so compute workers never import matplotlib
+        from PHY407_Zafar_Functions_Plot import plotwitcomplex
+        plotwitcomplex(points, pointsL, trial, nearest=nearest)
     
+    if topk is not None:
+        # 3-6. Build and reduce the filtration block by block
+        print("3-6. Computing Adaptive Filtration")
+        if nu is None:
+            E = landmarkdistances(pointsL)
+        intervals, stats = adaptivepersistence(start, end, step, E, topk)
+        print("-> " + str(stats["simplices"]) + " of " + str(stats["total"]) + " simplices up to epsilon "
+              + str(round(stats["cutoff"], 4)) + ", reduced in : " + str(stats["seconds"]) + " sec")
+        print("---- ---- ---- ---- ---- ---- ---- ---- ---- ----")
+        return intervals
+
     # 3. Generate a list of simplices and metric indices from a
     # Vietoris-Rips flitration on the reduced point cloud
-    print("3. Creating Vietoris-Rips Filtration")
-    list_simplices, list_eps = vrfilt(start, end, step, pointsL)
+    if nu is None:
+        print("3. Creating Vietoris-Rips Filtration")
+        list_simplices, list_eps = vrfilt(start, end, step, pointsL)
+    else:
+        print("3. Creating Lazy Witness Filtration")
+        list_simplices, list_eps = flagfilt(start, end, step, E)
     print("-> total of " + str(len(list_simplices)) + " simplices in filtration")
     # 4. Create a boundary matrix of the V-R filtration
     print("4. Creating Boundary Matrix")
     tstart = time.perf_counter()
-    boundary = createboundarymat(list_simplices)
+    boundary = createboundarymat(list_simplices, strict)
     # 5. Reduce the boundary matrix
     print("5. Reducing Boundary Matrix")
-    boundary_red = reduceboundarymat(boundary)
+    if nworkers is None:
+        boundary_red = reduceboundarymat(boundary)
+    else:
+        boundary_red = reduceboundarymatparallel(boundary, nworkers)
     texecute = time.perf_counter() - tstart # Execution time
     print("-> boundary matrix reduced in : " +str(texecute) + " sec")
     # 6. Compute the k-largest intervals from reduced boundary matrix
@@ -119,7 +162,7 @@ def persistenthomology(x, y, xrange, yrange, landmarks, start, step, end, pltWit
     
     return intervals
 
-def wassersteindist(intervals,k):
+def wassersteindist(intervals,k,metric="W1",A_thresh=0.5):
     """
     Main function to compute the wasserstein distance between intervals for each trial
 
@@ -127,16 +170,31 @@ def wassersteindist(intervals,k):
     ----------
     intervals : list[array[floats]], length: N
         list of N homology intervals
-    k : TYPE
+    k : int
         number of homology intervals to consider for distance computation
+    metric : string
+        'W1' --> Wasserstein distance (default)
+        'W2' --> 2-Wasserstein distance
+        'bottleneck' --> bottleneck distance
+        'sinkhorn' --> batched entropic approximation of W1 (see sinkhorndist)
+    A_thresh : float
+        adjacency threshold on the normalized distance
+            --> 'sinkhorn' only: pairs near it are solved exactly
 
     Returns
     -------
     D : matrix[float], size: NxN
-        Wasserstein distance matrix
+        Wasserstein (or bottleneck) distance matrix
+    E : matrix[float], size: NxN
+        'sinkhorn' only, returned as (D, E): error bound of each entry of D
+        (0 where the pair was solved exactly)
 
     """
-    print("---- COMPUTING WASSERSTEIN DISTANCES ----")
+    if metric == "sinkhorn":
+        D, E = sinkhorndist(intervals, k, A_thresh)[:2]
+        return D, E
+
+    print("---- COMPUTING WASSERSTEIN DISTANCES: " + str(metric) + " ----")
     print("Progress: ", end="")
     # Keep track of progress
     progress = 0
@@ -149,19 +207,8 @@ def wassersteindist(intervals,k):
             # Take the k longest intervals in each set
             B1 = intervals[a][-k:,:]
             B2 = intervals[b][-k:,:]
-            # 1. Project intervals onto diagonal
-            B1D, B2D = projectdiagonals(B1,B2)
-            # 2. Exchange intervals and diagonals
-            B1_B2D, B2_B1D = exchangediagonals(B1, B2, B1D, B2D)
-            # 3. Create bipartite cost matrix
-            Cost = createbipartitematrix(B1_B2D, B2_B1D)
-            # 4. Reduce cost matrix with Hungarian Algorithm
-            Cost_red = hungarianalgorithm(Cost)
-            # 5. Set optimal assignment
-            pair = assignpairs(Cost_red)
-            # 6. Compute distance
-            dist = wassersteindistpairwise(B1_B2D, B2_B1D, pair)
-            D[a,b] = dist
+            # Compute distance
+            D[a,b] = wassersteinpair(B1, B2, metric)
 
             # Update and print progress
             progress += 1
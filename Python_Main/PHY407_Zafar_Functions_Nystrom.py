@@ -0,0 +1,171 @@
+"""
+Helper Functions - Landmark MDS (Nystrom) Approximation of the Wasserstein Matrix
+PHY 407 - Gait Distinction via Hip-Knee Coordination
+Authors:
+        Abdullah Zafar, 999730411
+"""
+
+from PHY407_Zafar_Functions_Wasserstein import wassersteinpair
+import numpy as np
+
+def referencediagrams(intervals, k, m, metric="W1"):
+    """
+    Choose m reference diagrams by farthest-point sampling in diagram space,
+    computing the exact distance of every trial to each reference on the way
+
+    The first reference is trial 0; each next reference is the trial farthest
+    from its nearest reference so far. Exactly N*m distances are evaluated
+    (fewer when trials coincide)
+
+    Parameters
+    ----------
+    intervals : list[array[floats]], length: N
+        list of N homology intervals
+    k : int
+        number of homology intervals to consider for distance computation
+    m : int
+        number of reference diagrams
+    metric : string
+        distance metric (see wassersteinpair)
+
+    Returns
+    -------
+    refs : array[int], size: m
+        trial index of each reference
+    R : matrix[float], size: Nxm
+        exact distance of every trial to every reference
+
+    """
+    n = len(intervals)
+    m = min(m, n)
+    refs = []
+    R = np.zeros((n, m))
+    nearest = np.full(n, np.inf)
+    r = 0
+    for c in range(m):
+        refs.append(r)
+        for i in range(n):
+            if i != r:
+                R[i,c] = wassersteinpair(intervals[i][-k:,:], intervals[r][-k:,:], metric)
+        nearest = np.minimum(nearest, R[:,c])
+        if nearest.max() <= 0:
+            # Every trial coincides with a reference
+            refs = refs + [r]*(m-c-1)
+            R[:,c+1:] = R[:,[c]]
+            break
+        r = int(np.argmax(nearest))
+
+    return np.array(refs), R
+
+def landmarkmds(R, refs, dim=None):
+    """
+    Embed all trials in a low-dimensional Euclidean space from their distances
+    to the reference diagrams (landmark MDS)
+
+    The references are placed by classical MDS of their own distance matrix;
+    every other trial is then triangulated from its squared distances to the
+    references, which is the Nystrom extension of the reference Gram matrix
+
+    Parameters
+    ----------
+    R : matrix[float], size: Nxm
+        distance of every trial to every reference (see referencediagrams)
+    refs : array[int], size: m
+        trial index of each reference
+    dim : int
+        embedding dimension (None --> every positive eigenvalue)
+
+    Returns
+    -------
+    X : matrix[float], size: Nxdim
+        coordinates of each trial
+
+    """
+    Dref2 = R[refs,:]**2
+    Dref2 = (Dref2 + Dref2.transpose())/2
+    m = len(refs)
+    # Classical MDS of the references: double centre the squared distances
+    J = np.eye(m) - 1.0/m
+    B = -0.5 * J @ Dref2 @ J
+    lam, U = np.linalg.eigh(B)
+    idx = np.argsort(lam)[::-1]
+    lam, U = lam[idx], U[:,idx]
+    positive = int(np.sum(lam > 1e-12*max(lam[0], 1e-300)))
+    dim = positive if dim is None else min(dim, positive)
+    lam, U = lam[:dim], U[:,:dim]
+    # Triangulate: x = -1/2 * pinv(L) (d^2 - mean reference d^2)
+    Lpinv = U / np.sqrt(lam)
+    X = -0.5 * (R**2 - Dref2.mean(axis=0)) @ Lpinv
+
+    return X
+
+def nystromdist(intervals, k, m, dim=None, nheldout=100, seed=0, metric="W1"):
+    """
+    Approximate the Wasserstein distance matrix of a cohort from the exact
+    distances to m reference diagrams, and measure the error on held-out pairs
+
+    Rows and columns of the references are exact; every other entry is the
+    Euclidean distance between the landmark MDS coordinates of the two trials
+
+    Parameters
+    ----------
+    intervals : list[array[floats]], length: N
+        list of N homology intervals
+    k : int
+        number of homology intervals to consider for distance computation
+    m : int
+        number of reference diagrams
+    dim : int
+        embedding dimension (None --> every positive eigenvalue)
+    nheldout : int
+        number of approximated pairs also solved exactly to measure the error
+    seed : int
+        seed of the held-out sample
+    metric : string
+        distance metric (see wassersteinpair)
+
+    Returns
+    -------
+    W : matrix[float], size: NxN
+        approximate distance matrix
+    X : matrix[float], size: Nxdim
+        coordinates of each trial (see landmarkmds)
+    refs : array[int], size: m
+        trial index of each reference
+    report : dict
+        'exact' --> number of exact distance evaluations for W
+        'heldout' --> number of held-out pairs
+        'mae', 'maxerr' --> mean and largest absolute error on the held-out pairs
+        'relerr' --> mean absolute error relative to max(W)
+
+    """
+    print("---- COMPUTING NYSTROM WASSERSTEIN DISTANCES: " + str(m) + " references ----")
+    n = len(intervals)
+    refs, R = referencediagrams(intervals, k, m, metric)
+    X = landmarkmds(R, refs, dim)
+
+    W = np.sqrt(np.maximum(np.sum((X[:,None,:] - X[None,:,:])**2, axis=2), 0))
+    W[:,refs] = R
+    W[refs,:] = R.transpose()
+    np.fill_diagonal(W, 0)
+
+    # Held-out exact pairs among the approximated entries
+    isref = np.zeros(n, dtype=bool)
+    isref[refs] = True
+    a, b = np.triu_indices(n, 1)
+    approx = ~isref[a] & ~isref[b]
+    a, b = a[approx], b[approx]
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(a), min(nheldout, len(a)), replace=False)
+    err = np.array([abs(W[a[s],b[s]] - wassersteinpair(intervals[a[s]][-k:,:], intervals[b[s]][-k:,:], metric))
+                    for s in sample])
+    Wmax = W.max() if W.size and W.max() > 0 else 1
+    report = {"exact": (n-1)*len(np.unique(refs)),
+              "heldout": len(sample),
+              "mae": float(err.mean()) if len(err) else 0.0,
+              "maxerr": float(err.max()) if len(err) else 0.0,
+              "relerr": float(err.mean()/Wmax) if len(err) else 0.0}
+    print("-> " + str(report["exact"]) + " exact distances, " + str(X.shape[1]) + " dimensions, held-out error: "
+          + str(round(100*report["relerr"], 2)) + "% of max(W) (mean), " + str(report["maxerr"]) + " (largest)")
+
+    return W, X, refs, report
@@ -5,12 +5,55 @@ Authors:
         Abdullah Zafar, 999730411
 """
 
-from PHY407_Zafar_Functions_Helper import norm
 import matplotlib.pyplot as plt
 import numpy as np
 plt.rcParams.update({'font.size': 12})
 
-def plotcrp(crp, data_labels):
+def decimatecurve(x, y, maxpoints):
+    """
+    Reduce a dense curve to at most ~maxpoints samples, keeping the samples with
+    the smallest and largest x and y values in each bucket so that the curve
+    looks the same at pixel resolution
+
+    Parameters
+    ----------
+    x : array[float], size: Nx1
+        x-values of the curve
+    y : array[float], size: Nx1
+        y-values of the curve
+    maxpoints : int
+        maximum number of samples to keep (e.g. 2x the figure width in pixels)
+
+    Returns
+    -------
+    xD : array[float]
+        decimated x-values, in the original sample order
+    yD : array[float]
+        decimated y-values, in the original sample order
+
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    n = len(x)
+    # Each bucket keeps up to 4 extreme samples
+    nbucket = max(maxpoints // 4, 1)
+    if n <= maxpoints or n < 2*nbucket:
+        return x, y
+    # Split the sample indices into equal buckets, padding the last one
+    size = -(-n // nbucket)
+    idx = np.arange(nbucket*size).reshape(nbucket, size)
+    idx[idx >= n] = n - 1
+    keep = np.concatenate([
+        idx[np.arange(nbucket), x[idx].argmin(axis=1)],
+        idx[np.arange(nbucket), x[idx].argmax(axis=1)],
+        idx[np.arange(nbucket), y[idx].argmin(axis=1)],
+        idx[np.arange(nbucket), y[idx].argmax(axis=1)],
+        [0, n-1]])
+    keep = np.unique(keep)
+
+    return x[keep], y[keep]
+
+def plotcrp(crp, data_labels, maxpoints=None):
     """
     Function to plot continuous relative phase over gait cycle % for each trial
 
@@ -20,6 +63,8 @@ def plotcrp(crp, data_labels):
         list of arrays holding CRP angle values for different trials
     data_labels : string
         list of data labels for each trial
+    maxpoints : int, optional
+        decimate each curve to at most maxpoints samples (None --> draw all)
 
     Returns
     -------
@@ -29,13 +74,17 @@ def plotcrp(crp, data_labels):
     plt.figure()
     for i in range(len(crp)):
         plt.title("CRP Hip-Knee")
-        plt.plot(100*np.arange(0,len(crp[i]),1)/len(crp[i]),crp[i],label=data_labels[i])
+        x = 100*np.arange(0,len(crp[i]),1)/len(crp[i])
+        y = crp[i]
+        if maxpoints:
+            x, y = decimatecurve(x, y, maxpoints)
+        plt.plot(x,y,label=data_labels[i])
         plt.xlabel("% Gait Cycle")
         plt.ylabel("CRP (degrees)")
         plt.legend()
         
         
-def plotcrpphase(crp, crpdot, data_labels):
+def plotcrpphase(crp, crpdot, data_labels, maxpoints=None):
     """
     Function to plot continuous relative phase space for each trial
 
@@ -47,6 +96,8 @@ def plotcrpphase(crp, crpdot, data_labels):
         list of arrays holding CRP angular velocity values for different trials
     data_labels : string
         list of data labels for each trial
+    maxpoints : int, optional
+        decimate each curve to at most maxpoints samples (None --> draw all)
 
     Returns
     -------
@@ -56,7 +107,11 @@ def plotcrpphase(crp, crpdot, data_labels):
     plt.figure()
     for i in range(len(crp)):
         plt.title("CRP Phase Space")
-        plt.plot(crp[i],crpdot[i],label=data_labels[i])
+        x = crp[i]
+        y = crpdot[i]
+        if maxpoints:
+            x, y = decimatecurve(x, y, maxpoints)
+        plt.plot(x,y,label=data_labels[i])
         plt.xlabel("CRP (degrees)")
         plt.ylabel("CRP Velocity (degrees/sec)")
         plt.legend()
@@ -96,7 +151,7 @@ def plotpersistencediagram(start, end, intervals, k, data_labels):
     plt.axis("equal")
     plt.grid()
 
-def plotmatrix(M, data_labels, title):
+def plotmatrix(M, data_labels, title, annotlimit=30):
     """
     Function to plot a data matrix
     Adapted from https://matplotlib.org/3.1.1/gallery/images_contours_and_fields/image_annotated_heatmap.html#sphx-glr-gallery-images-contours-and-fields-image-annotated-heatmap-py
@@ -109,6 +164,8 @@ def plotmatrix(M, data_labels, title):
         list of data labels for each trial
     title : string
         title to display
+    annotlimit : int, optional
+        largest matrix size for which cell values and tick labels are drawn
 
     Returns
     -------
@@ -119,23 +176,24 @@ def plotmatrix(M, data_labels, title):
     im = ax.imshow(M)
     ax.set_title(title)
     
-    # Display ticks
-    ax.set_xticks(np.arange(len(data_labels)))
-    ax.set_yticks(np.arange(len(data_labels)))
-    
-    # Set tick labels to data labels
-    ax.set_xticklabels(data_labels)
-    ax.set_yticklabels(data_labels)
-    
-    # Rotate the tick labels and set their alignment.
-    plt.setp(ax.get_xticklabels(), rotation=20, ha="right",
-             rotation_mode="anchor")
-    
-    # Loop over data dimensions and create text annotations.
-    for i in range(len(M)):
-        for j in range(len(M)):
-            text = ax.text(j, i, round(M[i, j]*100)/100,
-                           ha="center", va="center", color="w")
+    if len(M) <= annotlimit:
+        # Display ticks
+        ax.set_xticks(np.arange(len(data_labels)))
+        ax.set_yticks(np.arange(len(data_labels)))
+        
+        # Set tick labels to data labels
+        ax.set_xticklabels(data_labels)
+        ax.set_yticklabels(data_labels)
+        
+        # Rotate the tick labels and set their alignment.
+        plt.setp(ax.get_xticklabels(), rotation=20, ha="right",
+                 rotation_mode="anchor")
+        
+        # Loop over data dimensions and create text annotations.
+        for i in range(len(M)):
+            for j in range(len(M)):
+                text = ax.text(j, i, round(M[i, j]*100)/100,
+                               ha="center", va="center", color="w")
             
     fig.colorbar(im)
     ax.axis('equal')
@@ -146,7 +204,7 @@ def plotmatrix(M, data_labels, title):
     ax.spines['left'].set_visible(False)
     
 
-def plotwitcomplex(points, pointsL, data_labels):
+def plotwitcomplex(points, pointsL, data_labels, D=None, nearest=None):
     """
     Function to plot a witness complex given a point cloud and set of landmarks
 
@@ -158,6 +216,10 @@ def plotwitcomplex(points, pointsL, data_labels):
         list of n landmark points to construct witness complex
     data_labels : string
         list of data labels for each trial
+    D : matrix[float], size: nxN, optional
+        precomputed landmark-witness distance matrix (None --> compute it)
+    nearest : array[int], size: Nx2, optional
+        precomputed two nearest landmarks of each witness (see lazywitness)
 
     Returns
     -------
@@ -166,19 +228,14 @@ def plotwitcomplex(points, pointsL, data_labels):
     """
     # #% Create Witness-Complex Skeleton
     # Create landmark-witness distance matrix:
-    D = np.zeros((len(pointsL), len(points)))
-    for i in range(len(pointsL)):
-        for j in range(len(points)):
-            D[i,j] = norm(pointsL[i], points[j])
-    
-    # Find vertices of witness edges
-    # Iterate over columns of D
-    pointsE = []
-    for j in range(len(points)):
-        min_id = D[:,j].argsort()
-        pointsE.append((min_id[0], min_id[1]))
-    
-    pointsE = list(set(pointsE))
+    if nearest is None:
+        if D is None:
+            P = np.asarray(points)
+            L = np.asarray(pointsL)
+            D = np.sqrt((L[:,None,0]-P[None,:,0])**2 + (L[:,None,1]-P[None,:,1])**2)
+        # Find vertices of witness edges: the two nearest landmarks of each witness
+        nearest = np.argsort(D, axis=0, kind="stable")[:2,:].transpose()
+    pointsE = np.unique(nearest, axis=0)
     
     plt.figure()
     plt.subplot(121)
@@ -0,0 +1,117 @@
+"""
+Helper Functions - Headless Batch Rendering
+PHY 407 - Gait Distinction via Hip-Knee Coordination
+Authors:
+        Abdullah Zafar, 999730411
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+# Default output resolution
+RENDER_DPI = 100
+# Default figure width in inches (matplotlib default figure size)
+RENDER_WIDTH = 6.4
+
+def initrenderer():
+    """
+    Select the non-interactive Agg backend in the current process, before
+    the plotting functions (and pyplot) are used
+
+    Returns
+    -------
+    None.
+
+    """
+    import matplotlib
+    matplotlib.use("Agg", force=True)
+
+def renderfigure(job, dpi=RENDER_DPI):
+    """
+    Draw one figure with a function from PHY407_Zafar_Functions_Plot and write
+    it straight to a file
+
+    Parameters
+    ----------
+    job : tuple, length: 4
+        (plot function name, list of arguments, dict of keyword arguments, output path)
+    dpi : int
+        output resolution
+
+    Returns
+    -------
+    path : string
+        path of the written file
+
+    """
+    initrenderer()
+    import matplotlib.pyplot as plt
+    import PHY407_Zafar_Functions_Plot as plot
+    func, args, kwargs, path = job
+    getattr(plot, func)(*args, **kwargs)
+    plt.gcf().savefig(path, dpi=dpi)
+    plt.close("all")
+
+    return path
+
+def renderbatch(jobs, nworkers=None, dpi=RENDER_DPI):
+    """
+    Render a list of figures to files in parallel worker processes
+
+    Parameters
+    ----------
+    jobs : list[tuple]
+        list of jobs, see renderfigure
+    nworkers : int
+        number of worker processes (None --> number of cores, 1 --> in-process)
+    dpi : int
+        output resolution
+
+    Returns
+    -------
+    paths : list[string]
+        paths of the written files, in the order of jobs
+
+    """
+    if nworkers == 1 or len(jobs) <= 1:
+        return [renderfigure(job, dpi) for job in jobs]
+    with ProcessPoolExecutor(max_workers=nworkers, initializer=initrenderer) as pool:
+        paths = list(pool.map(renderfigure, jobs, [dpi]*len(jobs)))
+
+    return paths
+
+def trialjobs(crp, crpdot, data_labels, outdir, dpi=RENDER_DPI):
+    """
+    Build one CRP plot and one CRP phase-space plot job per trial, with curves
+    decimated to the pixel width of the output figure
+
+    Parameters
+    ----------
+    crp : list[array], size: Nx1
+        list of arrays holding CRP angle values for different trials
+    crpdot : list[array], size: Nx1
+        list of arrays holding CRP angular velocity values for different trials
+    data_labels : list[string]
+        list of data labels for each trial
+    outdir : string
+        directory to write the figures into
+    dpi : int
+        output resolution
+
+    Returns
+    -------
+    jobs : list[tuple]
+        list of jobs, see renderfigure
+
+    """
+    # Keep the extremes of each pixel column
+    maxpoints = 4*int(RENDER_WIDTH*dpi)
+    jobs = []
+    for i in range(len(crp)):
+        label = str(data_labels[i])
+        jobs.append(("plotcrp", [[crp[i]], [label]], {"maxpoints": maxpoints},
+                     os.path.join(outdir, "crp_" + label + ".png")))
+        jobs.append(("plotcrpphase", [[crp[i]], [crpdot[i]], [label]], {"maxpoints": maxpoints},
+                     os.path.join(outdir, "crpphase_" + label + ".png")))
+
+    return jobs
@@ -0,0 +1,198 @@
+"""
+Helper Functions - Memory-Budget Scheduling of Homology Jobs
+PHY 407 - Gait Distinction via Hip-Knee Coordination
+Authors:
+        Abdullah Zafar, 999730411
+"""
+
+from PHY407_Zafar_Functions_Helper import gennormpoints
+from PHY407_Zafar_Functions_Topology import witnesscomplex, vrfilt, createboundarymat, reduceboundarymat, getintervals
+from PHY407_Zafar_Functions_Cohomology import landmarkdistances
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from math import comb
+import numpy as np
+import time
+import os
+
+# Peak bytes per boundary matrix entry: the float64 matrix, its reduced float64
+# copy and the temporaries of reduceboundarymat
+SCHED_BYTES_PER_ENTRY = 24
+# Resident memory of an idle worker process with the analysis modules loaded
+SCHED_WORKER_BYTES = 48 * 2**20
+# Seconds per unit of work, measured on the reference machine:
+SCHED_VRFILT_SEC = 1.0e-8 # per epsilon x simplex x candidate simplex (vrfilt)
+SCHED_BOUNDARY_SEC = 5.6e-8 # per boundary matrix entry (createboundarymat)
+SCHED_REDUCE_SEC = 8.0e-8 # per triangle x boundary matrix entry (reduceboundarymat)
+
+def estimatejob(pointsL, start, step, end):
+    """
+    Estimate the size, peak memory and runtime of steps 3-6 of
+    persistenthomology from the landmark distance distribution
+
+    Parameters
+    ----------
+    pointsL : list[tuples], length: L
+        landmark points (see witnesscomplex)
+    start : float
+        smallest epsilon to use in Vietoris-Rips filtration computation
+    step : float
+        step size for epsilon to use in Vietoris-Rips filtration computation
+    end : float
+        largest epsilon to use in Vietoris-Rips filtration computation
+
+    Returns
+    -------
+    estimate : dict
+        'edges', 'triangles', 'simplices' --> size of the filtration
+        'memory' --> estimated peak memory of the job in bytes
+        'runtime' --> estimated runtime in seconds
+
+    """
+    epsilon = np.arange(start, end+step, step)
+    n = len(pointsL)
+    # An edge enters the filtration if it is shorter than the last epsilon,
+    # a triangle if all three of its edges do
+    A = (landmarkdistances(pointsL) < epsilon[-1]).astype(np.int64)
+    np.fill_diagonal(A, 0)
+    edges = int(A.sum() // 2)
+    triangles = int(np.trace(A @ A @ A) // 6)
+    K = edges + triangles
+    memory = SCHED_BYTES_PER_ENTRY*K**2 + SCHED_WORKER_BYTES
+    runtime = (SCHED_VRFILT_SEC*len(epsilon)*K*(comb(n, 2) + comb(n, 3))
+               + SCHED_BOUNDARY_SEC*K**2 + SCHED_REDUCE_SEC*triangles*K**2)
+    estimate = {"edges": edges, "triangles": triangles, "simplices": K,
+                "memory": memory, "runtime": runtime}
+
+    return estimate
+
+def availablememory():
+    """
+    Get the memory available for new processes, from /proc/meminfo
+
+    Returns
+    -------
+    available : int
+        available memory in bytes (None if it cannot be read)
+
+    """
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    return None
+
+def homologyjob(pointsL, start, step, end):
+    """
+    Worker job: steps 3-6 of persistenthomology on precomputed landmarks,
+    without progress output
+
+    Parameters
+    ----------
+    pointsL : list[tuples], length: L
+        landmark points (see witnesscomplex)
+    start, step, end : float
+        Vietoris-Rips filtration parameters
+
+    Returns
+    -------
+    intervals : array[floats], size: Kx2
+        array of the K homology intervals
+
+    """
+    list_simplices, list_eps = vrfilt(start, end, step, pointsL)
+    boundary_red = reduceboundarymat(createboundarymat(list_simplices))
+    intervals = getintervals(boundary_red, list_eps)
+
+    return intervals
+
+def schedulejobs(jobs, budget=None, nworkers=None):
+    """
+    Run persistent homology jobs in a worker pool without exceeding a memory
+    budget
+
+    The landmarks of every job are chosen first, and used to estimate its
+    peak memory (see estimatejob). Jobs are then admitted largest first: each
+    time a worker is free, the largest waiting job whose estimate fits in the
+    unused budget is started. Jobs that do not fit in the budget even alone
+    are run one at a time in this process once the pool has finished
+
+    Parameters
+    ----------
+    jobs : list[tuple]
+        arguments of each job, as for persistenthomology:
+        (x, y, xrange, yrange, landmarks, start, step, end, trial)
+    budget : int
+        memory budget in bytes (None --> available memory)
+    nworkers : int
+        number of worker processes (None --> number of cores)
+
+    Returns
+    -------
+    intervals : list[array[floats]]
+        homology intervals of each job, in the given order
+    report : list[dict]
+        estimate of each job (see estimatejob), with
+        'trial' --> job label
+        'mode' --> 'pool' or 'serial'
+        'seconds' --> measured runtime in seconds (including pool queueing)
+
+    """
+    if budget is None:
+        budget = availablememory() or 2**32
+    print("---- ---- ---- ---- ---- ---- ---- ---- ---- ----")
+    print("---- SCHEDULING " + str(len(jobs)) + " HOMOLOGY JOBS: budget " + str(budget // 2**20) + " MB ----")
+
+    # Choose landmarks and estimate every job
+    tasks = []
+    report = []
+    for x, y, xrange, yrange, landmarks, start, step, end, trial in jobs:
+        pointsL = witnesscomplex(gennormpoints(x, y, xrange, yrange), landmarks)
+        tasks.append((pointsL, start, step, end))
+        estimate = estimatejob(pointsL, start, step, end)
+        estimate["trial"] = trial
+        estimate["mode"] = "pool" if estimate["memory"] <= budget else "serial"
+        report.append(estimate)
+        print("-> " + str(trial) + ": " + str(estimate["simplices"]) + " simplices, ~"
+              + str(estimate["memory"] // 2**20) + " MB, ~" + str(round(estimate["runtime"], 1)) + " sec ("
+              + estimate["mode"] + ")")
+
+    intervals = [None]*len(jobs)
+    waiting = sorted([i for i in range(len(jobs)) if report[i]["mode"] == "pool"],
+                     key=lambda i: -report[i]["memory"])
+    tstart = time.perf_counter()
+    if waiting:
+        nfree = nworkers if nworkers else (os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=nfree) as pool:
+            used = 0
+            running = {}
+            while waiting or running:
+                # Admit the largest waiting jobs that fit in the unused budget
+                for i in list(waiting):
+                    if nfree == 0:
+                        break
+                    if used + report[i]["memory"] <= budget:
+                        running[pool.submit(homologyjob, *tasks[i])] = i
+                        used += report[i]["memory"]
+                        nfree -= 1
+                        waiting.remove(i)
+                done, pending = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    i = running.pop(fut)
+                    intervals[i] = fut.result()
+                    report[i]["seconds"] = time.perf_counter() - tstart
+                    used -= report[i]["memory"]
+                    nfree += 1
+
+    # Spill the jobs too large for the budget to serial execution
+    for i in range(len(jobs)):
+        if report[i]["mode"] == "serial":
+            tjob = time.perf_counter()
+            intervals[i] = homologyjob(*tasks[i])
+            report[i]["seconds"] = time.perf_counter() - tjob
+    print("-> all jobs done in " + str(round(time.perf_counter() - tstart, 2)) + " sec")
+
+    return intervals, report
@@ -0,0 +1,518 @@
+"""
+Helper Functions - Asynchronous Ingestion Service
+PHY 407 - Gait Distinction via Hip-Knee Coordination
+Authors:
+        Abdullah Zafar, 999730411
+"""
+
+from PHY407_Zafar_Functions_Helper import gennormpoints
+from PHY407_Zafar_Functions_CRP import processphasespace, relphasediff
+from PHY407_Zafar_Functions_Topology import *
+from PHY407_Zafar_Functions_Wasserstein import wassersteinpair
+from PHY407_Zafar_Functions_JIT import warmup
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import asyncio
+import signal
+import struct
+import json
+import time
+import os
+
+# Largest accepted message header and payload, in bytes
+SERVICE_MAX_HEADER = 1 << 16
+SERVICE_MAX_PAYLOAD = 1 << 30
+
+def trialdiagram(raw, xminmax, yminmax, landmarks, start, step, end):
+    """
+    Compute the homology intervals of one recording, as MainProgram does but
+    normalized on fixed reference ranges and without progress output
+
+    Parameters
+    ----------
+    raw : array[float], size: Nx4
+        formatted data array (see continuousrelphase)
+    xminmax : list[float], length: 2
+        reference range of CRP angle values
+    yminmax : list[float], length: 2
+        reference range of CRP angular velocity values
+    landmarks : int
+        number of landmark points to use in witness complex construction
+    start : float
+        smallest epsilon to use in Vietoris-Rips filtration computation
+    step : float
+        step size for epsilon to use in Vietoris-Rips filtration computation
+    end : float
+        largest epsilon to use in Vietoris-Rips filtration computation
+
+    Returns
+    -------
+    intervals : array[floats], size: Kx2
+        array of the K homology intervals of the recording
+
+    """
+    thHN, omHN, thKN, omKN = processphasespace(raw)
+    crp = relphasediff(thHN, omHN, thKN, omKN)
+    crpdot = np.gradient(crp)
+    points = gennormpoints(crp, crpdot, xminmax, yminmax)
+    pointsL = witnesscomplex(points, landmarks)
+    list_simplices, list_eps = vrfilt(start, end, step, pointsL)
+    boundary_red = reduceboundarymat(createboundarymat(list_simplices))
+    intervals = getintervals(boundary_red, list_eps)
+
+    return intervals
+
+def analysetrial(raw, config):
+    """
+    Worker-side job: compute the diagram of a recording and find the nearest
+    reference gait
+
+    Parameters
+    ----------
+    raw : array[float], size: Nx4
+        formatted data array (see continuousrelphase)
+    config : dict
+        service configuration (see createservice)
+
+    Returns
+    -------
+    result : dict
+        'intervals' --> list of [birth, death] homology intervals
+        'nearest' --> label of the nearest reference trial (None if no references)
+        'distance' --> Wasserstein distance to the nearest reference trial
+        'compute' --> compute time in seconds
+
+    """
+    tstart = time.perf_counter()
+    intervals = trialdiagram(raw, config["xminmax"], config["yminmax"], config["landmarks"],
+                             config["start"], config["step"], config["end"])
+    k = config["k"]
+    nearest = None
+    distance = None
+    if len(intervals):
+        for label, ref in zip(config["labels"], config["reference"]):
+            d = wassersteinpair(np.asarray(ref)[-k:,:], intervals[-k:,:])
+            if distance is None or d < distance:
+                nearest, distance = label, float(d)
+    result = {"intervals": np.asarray(intervals).tolist(), "nearest": nearest,
+              "distance": distance, "compute": time.perf_counter() - tstart}
+
+    return result
+
+def createservice(labels, reference, xminmax, yminmax, landmarks=10, start=0, step=0.01,
+                  end=3, k=3, nworkers=None, maxqueue=64, datadir=None):
+    """
+    Create the state of an ingestion service
+
+    Parameters
+    ----------
+    labels : list[string]
+        labels of the reference trials
+    reference : list[array[floats]]
+        homology intervals of the reference trials
+    xminmax : list[float], length: 2
+        range of CRP angle values used to normalize submitted trials
+    yminmax : list[float], length: 2
+        range of CRP angular velocity values used to normalize submitted trials
+    landmarks, start, step, end : int, float, float, float
+        persistent homology parameters (see persistenthomology)
+    k : int
+        number of homology intervals to consider for distance computation
+    nworkers : int
+        number of compute worker processes (None --> number of cores)
+    maxqueue : int
+        largest number of queued trials before submitters are held back
+    datadir : string
+        directory that 'submitfile' requests may read recordings from
+            --> None: 'submitfile' is refused
+
+    Returns
+    -------
+    service : dict
+        service state, to pass to runservice
+
+    """
+    config = {"labels": list(labels), "reference": [np.asarray(r).tolist() for r in reference],
+              "xminmax": list(xminmax), "yminmax": list(yminmax), "landmarks": landmarks,
+              "start": start, "step": step, "end": end, "k": k}
+    service = {"config": config, "nworkers": nworkers, "maxqueue": maxqueue,
+               "datadir": os.path.realpath(datadir) if datadir is not None else None,
+               "latency": [], "completed": 0, "failed": 0, "draining": False}
+
+    return service
+
+async def readmessage(reader):
+    """
+    Read one framed message: a 4-byte big-endian header length, a JSON header,
+    then header['nbytes'] bytes of binary payload
+
+    Parameters
+    ----------
+    reader : asyncio.StreamReader
+        stream to read from
+
+    Returns
+    -------
+    header : dict
+        message header (None at end of stream)
+    payload : bytes
+        message payload
+
+    """
+    try:
+        size = struct.unpack(">I", await reader.readexactly(4))[0]
+    except asyncio.IncompleteReadError:
+        return None, b""
+    if size > SERVICE_MAX_HEADER:
+        raise ValueError("message header too large")
+    header = json.loads(await reader.readexactly(size))
+    if not isinstance(header, dict):
+        raise ValueError("message header must be a JSON object")
+    nbytes = int(header.get("nbytes", 0))
+    if nbytes > SERVICE_MAX_PAYLOAD:
+        raise ValueError("message payload too large")
+    payload = await reader.readexactly(nbytes) if nbytes else b""
+
+    return header, payload
+
+async def writemessage(writer, header, payload=b""):
+    """
+    Write one framed message (see readmessage)
+
+    Parameters
+    ----------
+    writer : asyncio.StreamWriter
+        stream to write to
+    header : dict
+        message header
+    payload : bytes
+        message payload
+
+    Returns
+    -------
+    None.
+
+    """
+    data = json.dumps(dict(header, nbytes=len(payload))).encode()
+    writer.write(struct.pack(">I", len(data)) + data + payload)
+    await writer.drain()
+
+def latencystats(service):
+    """
+    Summarize the per-request latencies of a service
+
+    Parameters
+    ----------
+    service : dict
+        service state
+
+    Returns
+    -------
+    stats : dict
+        request counts, queue depth and, for the queue wait, compute and total
+        latency in seconds: mean, 50th/95th percentile and maximum
+
+    """
+    stats = {"completed": service["completed"], "failed": service["failed"],
+             "queued": service["queue"].qsize() if "queue" in service else 0,
+             "draining": service["draining"]}
+    if service["latency"]:
+        L = np.array(service["latency"])
+        for c, name in enumerate(("wait", "compute", "total")):
+            stats[name] = {"mean": float(L[:,c].mean()), "p50": float(np.percentile(L[:,c], 50)),
+                           "p95": float(np.percentile(L[:,c], 95)), "max": float(L[:,c].max())}
+
+    return stats
+
+async def computeworker(service):
+    """
+    Take queued trials, run them in the process pool and send back the result
+
+    Parameters
+    ----------
+    service : dict
+        running service state
+
+    Returns
+    -------
+    None.
+
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        job = await service["queue"].get()
+        header, raw, writer, lock, treceived, done = job
+        twait = time.perf_counter()
+        try:
+            result = await loop.run_in_executor(service["pool"], analysetrial, raw, service["config"])
+            tdone = time.perf_counter()
+            service["latency"].append((twait - treceived, result["compute"], tdone - treceived))
+            service["completed"] += 1
+            reply = dict(result, id=header.get("id"), trial=header.get("trial"),
+                         latency={"wait": twait - treceived, "total": tdone - treceived})
+        except Exception as err:
+            # The details stay in the service log, the client gets a generic error
+            print("Trial " + str(header.get("trial")) + " failed: " + repr(err))
+            service["failed"] += 1
+            reply = {"id": header.get("id"), "trial": header.get("trial"), "error": "analysis failed"}
+        try:
+            async with lock:
+                await writemessage(writer, reply)
+        except (ConnectionError, RuntimeError):
+            pass
+        finally:
+            done.set_result(None)
+            service["queue"].task_done()
+
+def datafile(datadir, path):
+    """
+    Resolve a 'submitfile' path inside the service data directory
+
+    Parameters
+    ----------
+    datadir : string
+        real path of the data directory (None --> file submission is disabled)
+    path : string
+        file path sent by the client, relative to datadir
+
+    Returns
+    -------
+    file : string
+        real path of the file
+            --> raises PermissionError if it lies outside datadir
+
+    """
+    if datadir is None:
+        raise PermissionError("file submission is disabled")
+    file = os.path.realpath(os.path.join(datadir, str(path)))
+    if os.path.commonpath([datadir, file]) != datadir or not os.path.isfile(file):
+        raise PermissionError("file is not in the data directory")
+
+    return file
+
+def parsetrial(header, payload, datadir=None):
+    """
+    Decode a submitted recording from a binary N x 4 array or a file path
+
+    Parameters
+    ----------
+    header : dict
+        'op' --> 'submit' (payload holds the array) or 'submitfile' (header['path'])
+        'shape', 'dtype' --> shape and numpy dtype string of the payload array
+    payload : bytes
+        raw array bytes
+    datadir : string
+        directory that 'submitfile' paths are restricted to (see datafile)
+
+    Returns
+    -------
+    raw : array[float], size: Nx4
+        formatted data array
+
+    """
+    if header["op"] == "submitfile":
+        raw = np.loadtxt(datafile(datadir, header.get("path")))
+    else:
+        raw = np.frombuffer(payload, dtype=np.dtype(header.get("dtype", "<f8")))
+        raw = raw.reshape(header["shape"]).astype(np.float64)
+    if raw.ndim != 2 or raw.shape[1] != 4:
+        raise ValueError("expected an N x 4 recording, got shape " + str(raw.shape))
+
+    return raw
+
+async def handleclient(service, reader, writer):
+    """
+    Serve one client connection: queue submitted trials (waiting while the
+    queue is full, which holds the client back) and answer control requests
+
+    Parameters
+    ----------
+    service : dict
+        running service state
+    reader : asyncio.StreamReader
+        client input stream
+    writer : asyncio.StreamWriter
+        client output stream
+
+    Returns
+    -------
+    None.
+
+    """
+    loop = asyncio.get_running_loop()
+    lock = asyncio.Lock()
+    pending = [] # completion futures of this client's queued trials
+    service["clients"][asyncio.current_task()] = writer
+    try:
+        while True:
+            header, payload = await readmessage(reader)
+            if header is None:
+                break
+            op = header.get("op")
+            if op in ("submit", "submitfile"):
+                if service["draining"]:
+                    reply = {"id": header.get("id"), "error": "service is draining"}
+                else:
+                    try:
+                        # Reading a file or a large payload must not hold up the event loop
+                        raw = await loop.run_in_executor(None, parsetrial, header, payload,
+                                                         service["datadir"])
+                    except PermissionError as err:
+                        reply = {"id": header.get("id"), "error": str(err)}
+                    except Exception as err:
+                        print("Trial " + str(header.get("trial")) + " rejected: " + repr(err))
+                        reply = {"id": header.get("id"), "error": "invalid trial"}
+                    else:
+                        done = loop.create_future()
+                        pending = [f for f in pending if not f.done()] + [done]
+                        await service["queue"].put((header, raw, writer, lock, time.perf_counter(), done))
+                        continue
+            elif op == "stats":
+                reply = {"id": header.get("id"), "stats": latencystats(service)}
+            elif op == "drain":
+                service["stop"].set()
+                reply = {"id": header.get("id"), "draining": True}
+            else:
+                reply = {"id": header.get("id"), "error": "unknown op: " + str(op)}
+            async with lock:
+                await writemessage(writer, reply)
+    except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        # Let queued replies for this client go out before closing
+        await asyncio.gather(*pending)
+        writer.close()
+        service["clients"].pop(asyncio.current_task(), None)
+
+async def runservice(service, address):
+    """
+    Run the ingestion service until it is drained by a 'drain' request or by
+    SIGINT/SIGTERM: stop accepting connections, finish every queued trial,
+    then shut the process pool down
+
+    Parameters
+    ----------
+    service : dict
+        service state (see createservice)
+    address : string
+        'unix:/path/to/socket' or 'host:port'
+
+    Returns
+    -------
+    stats : dict
+        final latency statistics (see latencystats)
+
+    """
+    loop = asyncio.get_running_loop()
+    service["queue"] = asyncio.Queue(maxsize=service["maxqueue"])
+    service["stop"] = asyncio.Event()
+    service["clients"] = {} # connection handler task --> writer
+    # Compile the kernels once here; the workers load them from the cache
+    warmup()
+    nworkers = service["nworkers"] if service["nworkers"] else (os.cpu_count() or 1)
+    service["pool"] = ProcessPoolExecutor(max_workers=nworkers)
+    workers = [asyncio.create_task(computeworker(service)) for i in range(nworkers)]
+
+    handler = lambda r, w: handleclient(service, r, w)
+    if address.startswith("unix:"):
+        server = await asyncio.start_unix_server(handler, path=address[5:])
+    else:
+        host, port = address.rsplit(":", 1)
+        server = await asyncio.start_server(handler, host, int(port))
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, service["stop"].set)
+        except (NotImplementedError, RuntimeError):
+            pass
+    print("---- SERVICE LISTENING: " + address + " (" + str(nworkers) + " workers) ----")
+
+    await service["stop"].wait()
+    print("---- SERVICE DRAINING ----")
+    service["draining"] = True
+    server.close()
+    await service["queue"].join()
+    # Every answer has been sent: hang up on the remaining clients
+    clients = list(service["clients"].items())
+    for task, writer in clients:
+        writer.close()
+    await asyncio.gather(*[task for task, writer in clients], return_exceptions=True)
+    for w in workers:
+        w.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    service["pool"].shutdown(wait=True)
+    stats = latencystats(service)
+    print("---- SERVICE STOPPED: " + str(stats["completed"]) + " trials ----")
+
+    return stats
+
+async def submittrials(address, raws, data_labels):
+    """
+    Client: submit recordings concurrently over one connection and collect
+    the answers as they arrive
+
+    Parameters
+    ----------
+    address : string
+        'unix:/path/to/socket' or 'host:port'
+    raws : list[array[float]]
+        list of formatted Nx4 data arrays
+    data_labels : list[string]
+        label of each recording
+
+    Returns
+    -------
+    results : list[dict]
+        reply for each recording, in submission order
+
+    """
+    if address.startswith("unix:"):
+        reader, writer = await asyncio.open_unix_connection(address[5:])
+    else:
+        host, port = address.rsplit(":", 1)
+        reader, writer = await asyncio.open_connection(host, int(port))
+
+    async def send():
+        for i in range(len(raws)):
+            raw = np.ascontiguousarray(raws[i], dtype="<f8")
+            await writemessage(writer, {"op": "submit", "id": i, "trial": str(data_labels[i]),
+                                        "shape": list(raw.shape), "dtype": "<f8"}, raw.tobytes())
+
+    sender = asyncio.create_task(send())
+    results = [None]*len(raws)
+    for n in range(len(raws)):
+        header, payload = await readmessage(reader)
+        if header is None:
+            break
+        results[header["id"]] = header
+    await sender
+    writer.close()
+
+    return results
+
+async def requestservice(address, op):
+    """
+    Client: send a control request ('stats' or 'drain') and wait for the reply
+
+    Parameters
+    ----------
+    address : string
+        'unix:/path/to/socket' or 'host:port'
+    op : string
+        'stats' or 'drain'
+
+    Returns
+    -------
+    reply : dict
+        reply header
+
+    """
+    if address.startswith("unix:"):
+        reader, writer = await asyncio.open_unix_connection(address[5:])
+    else:
+        host, port = address.rsplit(":", 1)
+        reader, writer = await asyncio.open_connection(host, int(port))
+    await writemessage(writer, {"op": op, "id": op})
+    reply, payload = await readmessage(reader)
+    writer.close()
+
+    return reply
@@ -0,0 +1,334 @@
+"""
+Helper Functions - Shared-Memory Trial Arena
+PHY 407 - Gait Distinction via Hip-Knee Coordination
+Authors:
+        Abdullah Zafar, 999730411
+"""
+
+from multiprocessing import shared_memory, resource_tracker
+from contextlib import contextmanager
+import numpy as np
+import json
+import os
+import secrets
+import sys
+import threading
+
+# Prefix of all arena segment names; the creating process id follows it so
+# that stale segments of dead creators can be found and removed
+ARENA_PREFIX = "phy407_"
+# Fields that can be stored for each trial
+ARENA_FIELDS = ("raw", "crp", "crpdot", "points", "intervals")
+# Byte alignment of every array in the arena
+ARENA_ALIGN = 64
+# Serialises the resource_tracker.register swap in attacharena (Python < 3.13)
+ARENA_LOCK = threading.Lock()
+# Arena this process attached to as a pool worker (see attachworker)
+ARENA_WORKER = {}
+
+def arenalayout(trials):
+    """
+    Compute the descriptor table and total size of an arena holding a set of trials
+
+    Parameters
+    ----------
+    trials : dict{string: dict{string: array}}
+        arrays to store for each trial id, keyed by field name:
+            'raw' --> array[float], size: Nx4, raw recording
+            'crp' --> array[float], size: Nx1, CRP angle
+            'crpdot' --> array[float], size: Nx1, CRP angular velocity
+            'points' --> array[float], size: Nx2, normalized point cloud
+            'intervals' --> array[float], size: Kx2, homology intervals
+
+    Returns
+    -------
+    table : dict{string: dict{string: list}}
+        descriptor table, for each trial id and field: [offset, shape, dtype]
+            --> offset is in bytes from the start of the data section
+    size : int
+        number of bytes needed for the data section
+
+    """
+    table = {}
+    size = 0
+    for trial, fields in trials.items():
+        table[str(trial)] = {}
+        for field, arr in fields.items():
+            if field not in ARENA_FIELDS:
+                raise ValueError("unknown arena field: " + str(field))
+            arr = np.asarray(arr)
+            table[str(trial)][field] = [size, list(arr.shape), arr.dtype.str]
+            # Pad each array up to the next aligned offset
+            size += -(-arr.nbytes // ARENA_ALIGN) * ARENA_ALIGN
+
+    return table, size
+
+def createarena(trials):
+    """
+    Create a shared-memory segment holding the arrays of a set of trials along
+    with a descriptor table, so that worker processes can attach by name
+
+    Parameters
+    ----------
+    trials : dict{string: dict{string: array}}
+        arrays to store for each trial id, keyed by field name (see arenalayout)
+
+    Returns
+    -------
+    shm : SharedMemory
+        shared-memory segment owned by the calling process
+            --> the segment is unlinked automatically if the owner dies
+    table : dict{string: dict{string: list}}
+        descriptor table of the arena
+
+    """
+    table, size = arenalayout(trials)
+    header = json.dumps(table).encode()
+    # Header: 8-byte length | descriptor table | padding to alignment
+    start = -(-(8 + len(header)) // ARENA_ALIGN) * ARENA_ALIGN
+    name = ARENA_PREFIX + str(os.getpid()) + "_" + secrets.token_hex(4)
+    shm = shared_memory.SharedMemory(name=name, create=True, size=start + max(size, 1))
+
+    shm.buf[:8] = np.uint64(len(header)).tobytes()
+    shm.buf[8:8 + len(header)] = header
+    # Copy each array into its slot
+    for trial, fields in trials.items():
+        for field, arr in fields.items():
+            offset, shape, dtype = table[str(trial)][field]
+            view = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start + offset)
+            view[...] = arr
+            del view
+
+    return shm, table
+
+def attacharena(name):
+    """
+    Attach to an existing arena without taking ownership of it, so that a
+    worker exiting (or crashing) never unlinks the segment
+
+    Parameters
+    ----------
+    name : string
+        name of the shared-memory segment (shm.name of the creator)
+
+    Returns
+    -------
+    shm : SharedMemory
+        attached shared-memory segment
+    table : dict{string: dict{string: list}}
+        descriptor table of the arena
+
+    """
+    # Attaching must not register the segment with the resource tracker: it
+    # would unlink the segment when the worker exits, and unregistering after
+    # the fact would drop the creator's registration when the tracker is shared.
+    # Before 3.13 this means swapping out resource_tracker.register for the
+    # whole process: ARENA_LOCK keeps concurrent attaches apart, but any other
+    # thread creating shared memory or semaphores meanwhile goes untracked, so
+    # attach from a single thread, e.g. a pool initialiser
+    if sys.version_info >= (3, 13):
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    else:
+        with ARENA_LOCK:
+            register = resource_tracker.register
+            resource_tracker.register = lambda name, rtype: None
+            try:
+                shm = shared_memory.SharedMemory(name=name)
+            finally:
+                resource_tracker.register = register
+    length = int(np.frombuffer(shm.buf[:8], dtype=np.uint64)[0])
+    table = json.loads(bytes(shm.buf[8:8 + length]).decode())
+
+    return shm, table
+
+def trialview(shm, table, trial, field):
+    """
+    Get a zero-copy, read-only view of one array of one trial in the arena
+
+    Parameters
+    ----------
+    shm : SharedMemory
+        arena segment
+    table : dict{string: dict{string: list}}
+        descriptor table of the arena
+    trial : string
+        trial id
+    field : string
+        one of 'raw', 'crp', 'crpdot', 'points', 'intervals'
+
+    Returns
+    -------
+    view : array[float]
+        view into the shared segment
+            --> must be deleted before the arena is closed
+
+    """
+    length = int(np.frombuffer(shm.buf[:8], dtype=np.uint64)[0])
+    start = -(-(8 + length) // ARENA_ALIGN) * ARENA_ALIGN
+    offset, shape, dtype = table[str(trial)][field]
+    view = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start + offset)
+    view.flags.writeable = False
+
+    return view
+
+def closearena(shm, unlink=False):
+    """
+    Detach from an arena, and optionally remove it from the system
+
+    Parameters
+    ----------
+    shm : SharedMemory
+        arena segment
+    unlink : boolean
+        True --> remove the segment (creator only)
+
+    Returns
+    -------
+    None.
+
+    """
+    try:
+        shm.close()
+    except BufferError:
+        # Views are still alive; the mapping is released when they are
+        pass
+    if unlink:
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+def cleanarenas():
+    """
+    Remove arena segments whose creating process no longer exists, e.g. after
+    the whole process group was killed before any cleanup could run
+
+    Returns
+    -------
+    removed : list[string]
+        names of the removed segments
+
+    """
+    removed = []
+    if not os.path.isdir("/dev/shm"):
+        return removed
+    for name in os.listdir("/dev/shm"):
+        if not name.startswith(ARENA_PREFIX):
+            continue
+        try:
+            pid = int(name[len(ARENA_PREFIX):].split("_")[0])
+        except ValueError:
+            # Not an arena name (no creator pid), leave it alone
+            continue
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            try:
+                os.remove(os.path.join("/dev/shm", name))
+            except FileNotFoundError:
+                # Removed meanwhile, e.g. by another cleanarenas
+                continue
+            removed.append(name)
+        except PermissionError:
+            pass
+
+    return removed
+
+@contextmanager
+def arena(trials):
+    """
+    Context manager creating an arena and always unlinking it on exit
+
+    Parameters
+    ----------
+    trials : dict{string: dict{string: array}}
+        arrays to store for each trial id, keyed by field name (see arenalayout)
+
+    Yields
+    ------
+    name : string
+        name to pass to worker processes for attacharena/attached
+
+    """
+    shm, table = createarena(trials)
+    try:
+        yield shm.name
+    finally:
+        closearena(shm, unlink=True)
+
+@contextmanager
+def attached(name):
+    """
+    Context manager attaching a worker to an arena and detaching it on exit
+
+    Parameters
+    ----------
+    name : string
+        name of the shared-memory segment
+
+    Yields
+    ------
+    view : function
+        view(trial, field) --> read-only array view (see trialview)
+
+    """
+    shm, table = attacharena(name)
+    try:
+        yield lambda trial, field: trialview(shm, table, trial, field)
+    finally:
+        closearena(shm)
+
+def attachworker(name):
+    """
+    Pool initializer: attach the worker process to an arena once, for all the
+    jobs it runs (see workerview)
+
+    Parameters
+    ----------
+    name : string
+        name of the shared-memory segment
+
+    Returns
+    -------
+    None.
+
+    """
+    if ARENA_WORKER.get("name") == name:
+        return
+    detachworker()
+    shm, table = attacharena(name)
+    ARENA_WORKER.update(name=name, shm=shm, table=table)
+
+def detachworker():
+    """
+    Detach the process from the arena of attachworker, if any
+
+    Returns
+    -------
+    None.
+
+    """
+    if ARENA_WORKER:
+        closearena(ARENA_WORKER["shm"])
+        ARENA_WORKER.clear()
+
+def workerview(trial, field):
+    """
+    Get a read-only view of one array of one trial in the arena of attachworker
+
+    Parameters
+    ----------
+    trial : string
+        trial id
+    field : string
+        one of 'raw', 'crp', 'crpdot', 'points', 'intervals'
+
+    Returns
+    -------
+    view : array[float]
+        view into the shared segment (see trialview)
+
+    """
+    view = trialview(ARENA_WORKER["shm"], ARENA_WORKER["table"], trial, field)
+
+    return view
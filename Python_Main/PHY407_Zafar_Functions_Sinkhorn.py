@@ -0,0 +1,309 @@
+"""
+Helper Functions - Batched Entropic (Sinkhorn) Wasserstein Approximation
+PHY 407 - Gait Distinction via Hip-Knee Coordination
+Authors:
+        Abdullah Zafar, 999730411
+"""
+
+from PHY407_Zafar_Functions_Wasserstein import wassersteinpair
+import numpy as np
+
+def batchcostmatrices(intervals, pairs, k):
+    """
+    Build the bipartite cost matrices of many diagram pairs as one padded
+    stack, augmenting each pair with the diagonals as exchangediagonals does
+
+    Parameters
+    ----------
+    intervals : list[array[floats]], length: N
+        list of N homology intervals
+    pairs : array[int], size: Px2
+        (a, b) trials of each pair
+    k : int
+        number of homology intervals to consider for distance computation
+
+    Returns
+    -------
+    C : array[float], size: PxMxM
+        cost matrix of each pair, zero-padded to the largest pair
+    mask : array[bool], size: PxM
+        True for the real (non-padding) rows/columns of each pair
+
+    """
+    B = [np.asarray(I, dtype=np.float64).reshape(-1, 2)[-k:,:] for I in intervals]
+    sizes = np.array([len(b) for b in B])
+    M = max(2*sizes.max(), 1) if len(sizes) else 1
+    P = len(pairs)
+    X = np.zeros((P, M, 2))
+    Y = np.zeros((P, M, 2))
+    mask = np.zeros((P, M), dtype=bool)
+    for p, (a, b) in enumerate(pairs):
+        B1, B2 = B[a], B[b]
+        # [B1; B2D] against [B2; B1D], with B1D/B2D as in projectdiagonals
+        n = len(B1) + len(B2)
+        X[p,:n] = np.vstack((B1, np.column_stack((B2[:,1], B2[:,1]))))
+        Y[p,:n] = np.vstack((B2, np.column_stack((B1[:,1], B1[:,1]))))
+        mask[p,:n] = True
+    # Same arithmetic as norm
+    C = np.sqrt((X[:,:,None,0]-Y[:,None,:,0])**2 + (X[:,:,None,1]-Y[:,None,:,1])**2)
+
+    return C, mask
+
+def logsumexp(Z, axis):
+    """
+    Stable log(sum(exp(Z))) along an axis, -inf for all -inf slices
+
+    Parameters
+    ----------
+    Z : array[float]
+        values
+    axis : int
+        axis to reduce
+
+    Returns
+    -------
+    S : array[float]
+        log-sum-exp of Z along axis
+
+    """
+    Zmax = np.max(Z, axis=axis, keepdims=True)
+    Zmax = np.where(np.isfinite(Zmax), Zmax, 0)
+    with np.errstate(divide="ignore"):
+        S = np.log(np.sum(np.exp(Z - Zmax), axis=axis)) + np.squeeze(Zmax, axis=axis)
+
+    return S
+
+def greedyassignment(C, score, valid):
+    """
+    Round many score matrices to assignments greedily: repeatedly take the
+    highest scoring remaining entry of every problem and strike out its row
+    and column
+
+    Parameters
+    ----------
+    C : array[float], size: PxMxM
+        cost matrices
+    score : array[float], size: PxMxM
+        score of each entry (e.g. a transport plan, or -C)
+    valid : array[bool], size: PxMxM
+        True for the entries of real rows and columns
+
+    Returns
+    -------
+    cost : array[float], size: P
+        cost of each rounded assignment
+
+    """
+    P, M = C.shape[:2]
+    batch = np.arange(P)
+    cost = np.zeros(P)
+    S = np.where(valid, score, -np.inf)
+    for it in range(M):
+        idx = np.argmax(S.reshape(P, -1), axis=1)
+        r, c = idx // M, idx % M
+        take = S[batch, r, c] > -np.inf
+        cost[take] += C[batch[take], r[take], c[take]]
+        S[batch[take], r[take], :] = -np.inf
+        S[batch[take], :, c[take]] = -np.inf
+
+    return cost
+
+def sinkhornbatch(C, mask, reg=0.002, niter=500, tol=1e-3):
+    """
+    Solve many entropic optimal transport problems at once with Sinkhorn
+    iterations, every point carrying unit mass, and bound the exact transport
+    (assignment) cost of each
+
+    The iterations are log-stabilized: the scalings are absorbed into the dual
+    potentials every 10 steps, so only batched matrix-vector products run
+    between two rebuilds of the kernel
+
+    Parameters
+    ----------
+    C : array[float], size: PxMxM
+        cost matrices (see batchcostmatrices)
+    mask : array[bool], size: PxM
+        real rows/columns of each problem
+    reg : float
+        entropic regularization, relative to the largest cost of each problem
+        (keep above ~0.0015 so exp(-C/eps) stays representable)
+    niter : int
+        largest number of Sinkhorn iterations
+    tol : float
+        stop once every marginal is within tol of one
+
+    Returns
+    -------
+    upper : array[float], size: P
+        cost of the assignment rounded from the Sinkhorn plan, an upper bound
+        of the exact cost (and the reported approximation)
+    lower : array[float], size: P
+        dual value of the c-transformed Sinkhorn potentials, a lower bound of
+        the exact cost
+
+    """
+    valid = mask[:,:,None] & mask[:,None,:]
+    scale = np.maximum(np.max(np.where(valid, C, 0), axis=(1,2)), 1e-12)
+    Cm = np.where(valid, C, np.inf)
+    f = np.zeros(mask.shape)
+    g = np.zeros(mask.shape)
+    w = mask.astype(np.float64)
+    # Epsilon scaling: start with a strong regularization and halve it, warm
+    # starting each stage from the potentials of the previous one
+    stages = [max(reg, 2.0**-s) for s in range(int(np.ceil(-np.log2(reg)))+1)]
+    for r in stages:
+        eps = (r*scale)[:,None,None]
+        active = np.arange(len(C))
+        for it in range(niter if r == stages[-1] else 20):
+            if it % 10 == 0:
+                # Absorb the scalings into the log-domain potentials and
+                # rebuild the stabilized kernel exp((f+g-C)/eps) <= 1
+                if it:
+                    f[active] += eps[active,:,0]*np.log(np.where(mask[active], u, 1))
+                    g[active] += eps[active,:,0]*np.log(np.where(mask[active], v, 1))
+                    # Columns are exact after the v update; drop the problems
+                    # whose rows are too
+                    rows = u * np.einsum("pij,pj->pi", K, v)
+                    keep = np.any(np.abs(np.where(mask[active], rows, 1) - 1) >= tol, axis=1)
+                    active = active[keep]
+                    if len(active) == 0:
+                        break
+                K = np.exp((f[active,:,None] + g[active,None,:] - Cm[active])/eps[active])
+                u = w[active].copy()
+                v = w[active].copy()
+            u = np.where(mask[active], w[active] / np.maximum(np.einsum("pij,pj->pi", K, v), 1e-300), 0)
+            v = np.where(mask[active], w[active] / np.maximum(np.einsum("pij,pi->pj", K, u), 1e-300), 0)
+        else:
+            if len(active):
+                f[active] += eps[active,:,0]*np.log(np.where(mask[active], u, 1))
+                g[active] += eps[active,:,0]*np.log(np.where(mask[active], v, 1))
+    eps = (reg*scale)[:,None,None]
+    Pl = np.exp((f[:,:,None] + g[:,None,:] - Cm)/eps)
+
+    # Any assignment costs at least the optimum, so the rounded plan gives an
+    # upper bound
+    upper = greedyassignment(C, Pl, valid)
+
+    # Two c-transforms of g give a feasible dual pair, a lower bound
+    fc = np.where(mask, np.min(Cm - g[:,None,:], axis=2), 0)
+    gc = np.where(mask, np.min(np.where(valid, Cm - fc[:,:,None], np.inf), axis=1), 0)
+    lower = np.sum(fc, axis=1) + np.sum(gc, axis=1)
+
+    return upper, lower
+
+def settlepairs(pairs, lower, upper, exact, A_thresh):
+    """
+    Decide the adjacency of every pair from bounds on its distance, solving
+    exactly only the pairs whose bounds do not settle it
+
+    First the pairs that could hold the largest distance are solved, so the
+    normalization max(W) is exact; then every pair whose bounds straddle
+    A_thresh*max(W) is solved
+
+    Parameters
+    ----------
+    pairs : array[int], size: Px2
+        (a, b) trials of each pair
+    lower : array[float], size: P
+        lower bound of each pair distance
+    upper : array[float], size: P
+        upper bound of each pair distance
+    exact : function
+        exact(a, b) returns the exact distance of a pair
+    A_thresh : float
+        adjacency threshold on the normalized distance
+
+    Returns
+    -------
+    value : array[float], size: P
+        exact distance of solved pairs, upper bound of the others
+    solved : array[bool], size: P
+        True for the pairs solved exactly
+    Wmax : float
+        largest distance
+
+    """
+    lower = np.array(lower, dtype=np.float64)
+    upper = np.array(upper, dtype=np.float64)
+    solved = np.zeros(len(pairs), dtype=bool)
+
+    def solve(idx):
+        for p in idx:
+            if not solved[p]:
+                d = exact(pairs[p][0], pairs[p][1])
+                lower[p] = upper[p] = d
+                solved[p] = True
+
+    # 1. Pairs that may be the largest
+    if len(pairs):
+        solve(np.where(upper >= lower.max())[0])
+    Wmax = lower.max() if len(pairs) else 0.0
+    # 2. Pairs whose bounds straddle the threshold
+    if Wmax > 0:
+        solve(np.where((lower/Wmax < A_thresh) & (upper/Wmax >= A_thresh))[0])
+    value = upper
+
+    return value, solved, Wmax
+
+def sinkhorndist(intervals, k, A_thresh=0.5, reg=0.002, niter=500, chunk=1024):
+    """
+    Approximate the Wasserstein distance matrix of a cohort with batched
+    Sinkhorn, falling back to exact matching for the pairs that decide the
+    normalization or lie near the adjacency threshold
+
+    Parameters
+    ----------
+    intervals : list[array[floats]], length: N
+        list of N homology intervals
+    k : int
+        number of homology intervals to consider for distance computation
+    A_thresh : float
+        adjacency threshold on the normalized distance
+    reg : float
+        entropic regularization (see sinkhornbatch)
+    niter : int
+        largest number of Sinkhorn iterations
+    chunk : int
+        number of pairs solved together
+
+    Returns
+    -------
+    W : matrix[float], size: NxN
+        approximate Wasserstein distance matrix (exact for the solved pairs)
+    E : matrix[float], size: NxN
+        error bound of each entry (upper - lower bound, 0 where exact)
+    A : matrix[float], size: NxN
+        adjacency matrix of W/max(W) < A_thresh, equal to the exact one
+    nexact : int
+        number of pairs solved exactly
+
+    """
+    print("---- COMPUTING SINKHORN WASSERSTEIN DISTANCES ----")
+    n = len(intervals)
+    a, b = np.triu_indices(n, 1)
+    pairs = np.column_stack((a, b))
+    upper = np.zeros(len(pairs))
+    lower = np.zeros(len(pairs))
+    for p0 in range(0, len(pairs), chunk):
+        C, mask = batchcostmatrices(intervals, pairs[p0:p0+chunk], k)
+        upper[p0:p0+chunk], lower[p0:p0+chunk] = sinkhornbatch(C, mask, reg, niter)
+    gap = upper - lower
+
+    exact = lambda i, j: wassersteinpair(intervals[i][-k:,:], intervals[j][-k:,:])
+    value, solved, Wmax = settlepairs(pairs, lower, upper, exact, A_thresh)
+    gap[solved] = 0
+
+    W = np.zeros((n, n))
+    E = np.zeros((n, n))
+    W[a, b] = value
+    E[a, b] = gap
+    W += W.transpose()
+    E += E.transpose()
+    A = np.zeros((n, n))
+    A[W/(Wmax if Wmax > 0 else 1) < A_thresh] = 1
+    np.fill_diagonal(A, 0)
+    nexact = int(solved.sum())
+    print("-> " + str(len(pairs)) + " pairs, " + str(nexact) + " solved exactly, largest error bound: "
+          + str(gap.max() if len(gap) else 0))
+
+    return W, E, A, nexact
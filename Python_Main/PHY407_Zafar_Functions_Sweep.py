@@ -0,0 +1,163 @@
+"""
+Helper Functions - Parameter Sweeps over Shared Intermediates
+PHY 407 - Gait Distinction via Hip-Knee Coordination
+Authors:
+        Abdullah Zafar, 999730411
+"""
+
+from PHY407_Zafar_Functions_Main import *
+from itertools import product
+from bisect import bisect_right
+import numpy as np
+
+# Sweep parameters in configuration order, with the MainProgram defaults
+SWEEP_PARAMS = ("nlandmarks", "start", "step", "end", "k", "A_thresh")
+SWEEP_DEFAULTS = {"nlandmarks": 10, "start": 0, "step": 0.01, "end": 3, "k": 3, "A_thresh": 0.5}
+
+def sweepconfigs(grid):
+    """
+    Expand a parameter grid into the list of configurations to run
+
+    Parameters
+    ----------
+    grid : dict{string: list}
+        values to sweep for each parameter in SWEEP_PARAMS
+            --> missing parameters take their SWEEP_DEFAULTS value
+
+    Returns
+    -------
+    configs : list[tuple]
+        list of configurations, each a tuple of values ordered as SWEEP_PARAMS
+
+    """
+    for p in grid:
+        if p not in SWEEP_PARAMS:
+            raise ValueError("unknown sweep parameter: " + str(p))
+    values = [list(grid.get(p, [SWEEP_DEFAULTS[p]])) for p in SWEEP_PARAMS]
+    configs = list(product(*values))
+
+    return configs
+
+def sweepgraph(configs, ntrials):
+    """
+    Build the dependency graph of stages needed by a set of configurations,
+    where every distinct intermediate appears exactly once:
+        crp (per trial) --> points (per trial) --> landmarks (per trial, most landmarks)
+        --> reduced (per trial, nlandmarks, start, step; filtration up to the largest end)
+        --> intervals (per trial and end; prefix of the reduced matrix)
+        --> W (per k) --> A (per A_thresh)
+
+    Parameters
+    ----------
+    configs : list[tuple]
+        list of configurations, see sweepconfigs
+    ntrials : int
+        number of trials
+
+    Returns
+    -------
+    graph : dict{tuple: list[tuple]}
+        dependencies of each stage node, in a valid execution order
+    outputs : dict{tuple: tuple}
+        the final A node of each configuration
+
+    """
+    graph = {}
+    outputs = {}
+    nmax = max(c[0] for c in configs)
+    # Largest end sharing each filtration grid and landmark count
+    endmax = {}
+    for (n, start, step, end, k, thresh) in configs:
+        endmax[(n, start, step)] = max(endmax.get((n, start, step), end), end)
+
+    for i in range(ntrials):
+        graph[("crp", i)] = []
+    for i in range(ntrials):
+        graph[("points", i)] = [("crp", j) for j in range(ntrials)]
+        graph[("landmarks", i, nmax)] = [("points", i)]
+    for (n, start, step, end, k, thresh) in configs:
+        filt = (n, start, step, endmax[(n, start, step)])
+        for i in range(ntrials):
+            graph.setdefault(("reduced", i) + filt, [("landmarks", i, nmax)])
+            graph.setdefault(("intervals", i, n, start, step, end), [("reduced", i) + filt])
+        graph.setdefault(("W", n, start, step, end, k),
+                         [("intervals", i, n, start, step, end) for i in range(ntrials)])
+        node = ("A", n, start, step, end, k, thresh)
+        graph.setdefault(node, [("W", n, start, step, end, k)])
+        outputs[(n, start, step, end, k, thresh)] = node
+
+    return graph, outputs
+
+def runsweep(raws, data_labels, grid):
+    """
+    Run the analysis of MainProgram for every configuration in a parameter grid,
+    computing each shared intermediate once and fanning out from it
+
+    Parameters
+    ----------
+    raws : list[array[float]], length: N
+        list of N formatted Nx4 data arrays (see continuousrelphase)
+    data_labels : list[string], length: N
+        label of each trial
+    grid : dict{string: list}
+        values to sweep for each parameter, see sweepconfigs
+
+    Returns
+    -------
+    results : dict{tuple: tuple}
+        for each configuration tuple (ordered as SWEEP_PARAMS):
+            (W, A) --> normalized Wasserstein distance and adjacency matrices
+    graph : dict{tuple: list[tuple]}
+        stage graph that was executed, see sweepgraph
+
+    """
+    configs = sweepconfigs(grid)
+    graph, outputs = sweepgraph(configs, len(raws))
+    print("---- SWEEP: " + str(len(configs)) + " configurations, " + str(len(graph)) + " stages ----")
+
+    value = {}
+    for node, deps in graph.items():
+        stage = node[0]
+        if stage == "crp":
+            i = node[1]
+            value[node] = continuousrelphase(raws[i], data_labels[i])
+        elif stage == "points":
+            # Cross-trial normalization over all trials, as in MainProgram
+            x = [value[d][0] for d in deps]
+            y = [value[d][1] for d in deps]
+            xminmax = [min(min(a) for a in x), max(max(a) for a in x)]
+            yminmax = [min(min(a) for a in y), max(max(a) for a in y)]
+            crp, crpdot = value[("crp", node[1])]
+            value[node] = gennormpoints(crp, crpdot, xminmax, yminmax)
+        elif stage == "landmarks":
+            # Max-min landmarks are greedy, so fewer landmarks are a prefix
+            value[node] = witnesscomplex(value[deps[0]], node[2])
+        elif stage == "reduced":
+            i, n, start, step, end = node[1:]
+            print("-> reducing filtration: trial " + str(data_labels[i]) +
+                  ", landmarks=" + str(n) + ", start=" + str(start) +
+                  ", step=" + str(step) + ", end=" + str(end))
+            list_simplices, list_eps = vrfilt(start, end, step, value[deps[0]][:n])
+            boundary_red = reduceboundarymat(createboundarymat(list_simplices))
+            value[node] = (boundary_red, list_eps)
+        elif stage == "intervals":
+            # A smaller end is a prefix of the filtration, and the standard
+            # reduction of a prefix is the leading block of the full reduction
+            start, step, end = node[3:]
+            boundary_red, list_eps = value[deps[0]]
+            epsilon = np.arange(start, end+step, step)
+            m = bisect_right(list_eps, epsilon[-1])
+            value[node] = getintervals(boundary_red[:m,:m], list_eps[:m])
+        elif stage == "W":
+            W = wassersteindist([value[d] for d in deps], node[-1])
+            value[node] = W / np.max(W)
+        elif stage == "A":
+            W = value[deps[0]]
+            A = np.zeros((len(W),len(W)))
+            A[W<node[-1]] = 1
+            np.fill_diagonal(A, 0)
+            value[node] = (W, A)
+
+    results = {config: value[node] for config, node in outputs.items()}
+
+    return results, graph
@@ -6,13 +6,17 @@ Authors:
 """
 
 from PHY407_Zafar_Functions_Helper import norm
+from PHY407_Zafar_Functions_JIT import JIT_AVAILABLE, reducekernel, maxminkernel
 import numpy as np
 from itertools import combinations
 from random import seed, randint
+from concurrent.futures import ProcessPoolExecutor
+import time
 
 def witnesscomplex(points, nland):
     """
     Downsample a point cloud using a set of landmark points
+    (with maxminkernel when numba is installed, see PHY407_Zafar_Functions_JIT)
 
     Parameters
     ----------
@@ -34,6 +38,9 @@ def witnesscomplex(points, nland):
     # First point
     seed(1)
     L.append(randint(0,npoints-1))
+    if JIT_AVAILABLE:
+        L = maxminkernel(np.array(points, dtype=np.float64).reshape(-1, 2), L[0], max(nland, 1))
+        return [points[l] for l in L]
     # max-min algorithm
     for i in range(nland-1):
         # Get min distances to landmarks
@@ -109,8 +116,113 @@ def vrfilt(start, end, step, points):
     
     return simp_list, e_list
 
+def lazywitness(points, pointsL, nu=2, block=None):
+    """
+    Compute the edge entry values of the lazy witness filtration, using every
+    point of the cloud as a witness
+
+    Edge [a,b] enters once some witness w has max(d(a,w), d(b,w)) <= e + m_w,
+    where m_w is the distance from w to its nu-th nearest landmark; triangles
+    enter once their three edges have (flag complex). The landmark-witness
+    distances are computed in one pass over blocks of witnesses and never held
+    in full
+
+    Parameters
+    ----------
+    points : list[tuples], length: N
+        list of N points in the point cloud (the witnesses)
+    pointsL : list[tuples], length: n
+        list of n landmark points (see witnesscomplex)
+    nu : int
+        0, 1 or 2: which nearest-landmark distance to discount (0 --> none)
+            --> at most the number of landmarks n
+    block : int
+        number of witnesses per block (None --> keep blocks near 4M entries)
+
+    Returns
+    -------
+    E : matrix[float], size: nxn
+        entry value of each landmark edge (use with flagfilt or cohomologyintervals)
+    nearest : array[int], size: Nx2
+        the two nearest landmarks of each witness, nearest first (see plotwitcomplex)
+
+    """
+    P = np.array(points, dtype=np.float64).reshape(-1, 2)
+    L = np.array(pointsL, dtype=np.float64).reshape(-1, 2)
+    n = len(L)
+    N = len(P)
+    if nu not in (0, 1, 2):
+        raise ValueError("nu must be 0, 1 or 2, got " + str(nu))
+    if nu > n:
+        raise ValueError("nu = " + str(nu) + " needs at least " + str(nu) + " landmarks, got " + str(n))
+    if block is None:
+        block = max(2**22 // max(n*n, 1), 1)
+    keep = min(max(nu, 2), n)
+    E = np.full((n, n), np.inf)
+    nearest = np.zeros((N, keep), dtype=np.int64)
+    for w0 in range(0, N, block):
+        w1 = min(w0+block, N)
+        # Landmark-witness distances of the block, with the arithmetic of norm
+        D = np.sqrt((L[:,None,0]-P[None,w0:w1,0])**2 + (L[:,None,1]-P[None,w0:w1,1])**2)
+        # Nearest landmarks of each witness, ties broken by landmark index
+        part = np.sort(np.argpartition(D, keep-1, axis=0)[:keep], axis=0)
+        dpart = np.take_along_axis(D, part, axis=0)
+        order = np.argsort(dpart, axis=0, kind="stable")
+        nearest[w0:w1] = np.take_along_axis(part, order, axis=0).transpose()
+        m = np.take_along_axis(dpart, order, axis=0)[nu-1] if nu > 0 else np.zeros(w1-w0)
+        # Best witness of every landmark pair within the block
+        E = np.minimum(E, (np.maximum(D[:,None,:], D[None,:,:]) - m).min(axis=2))
+    E = np.maximum(E, 0)
+    np.fill_diagonal(E, 0)
+
+    return E, nearest[:,:2]
+
+def flagfilt(start, end, step, E):
+    """
+    Generate the filtration of the flag complex of an edge value matrix, with
+    the simplex order and epsilon values of vrfilt
+
+    Parameters
+    ----------
+    start : float
+        smallest epsilon to use in the filtration
+    end : float
+        largest epsilon to use in the filtration
+    step : float
+        step size for epsilon to use in the filtration
+    E : matrix[float], size: nxn
+        entry value of each edge, e.g. landmark distances or lazywitness values
+
+    Returns
+    -------
+    simp_list : list[tuples], length: K
+        ordered list of all the simplices in the filtration as tuples of landmark indices
+        1. simplices are ordered by entry into filtration
+        2. simplices are ordered by size
+    e_list : list[float], length: K
+        dual list to simp_list, keeping track of the entry points of simplices
+        into the filtration
 
-def createboundarymat(simplices):
+    """
+    epsilon = np.arange(start,end+step,step)
+    n = len(E)
+    # An edge enters at the first epsilon strictly above its value
+    V = np.searchsorted(epsilon, E, side="right")
+    I, J = np.triu_indices(n, 1)
+    T = np.array(list(combinations(range(n), 3)), dtype=np.int64).reshape(-1, 3)
+    val = np.concatenate((V[I,J], np.maximum(np.maximum(V[T[:,0],T[:,1]], V[T[:,0],T[:,2]]), V[T[:,1],T[:,2]])))
+    dim = np.concatenate((np.ones(len(I), dtype=np.int64), np.full(len(T), 2)))
+    S = np.vstack((np.column_stack((I, J, np.full(len(I), -1))), T))
+    # By entry value, then edges before triangles, then combination order
+    order = np.lexsort((S[:,2], S[:,1], S[:,0], dim, val))
+    order = order[val[order] < len(epsilon)]
+    simp_list = [tuple(int(v) for v in S[o,:dim[o]+1]) for o in order]
+    e_list = [epsilon[val[o]] for o in order]
+
+    return simp_list, e_list
+
+
+def createboundarymat(simplices, strict=False):
     """
     Given an ordered list of simplices in a filtration, generate the boundary matrix
 
@@ -120,6 +232,12 @@ def createboundarymat(simplices):
         ordered list of all the simplices in the filtration as tuples of points
         1. simplices are ordered by entry into filtration
         2. simplices are ordered by size
+    strict : boolean
+        False --> simplex_i is taken as a face of simplex_j when its first two
+                  points are in simplex_j (so triangles sharing an edge are also
+                  marked, as in the original analysis)
+        True --> only codimension-1 faces are marked (the standard boundary
+                 matrix, whose reduction matches cohomologyintervals)
 
     Returns
     -------
@@ -141,7 +259,8 @@ def createboundarymat(simplices):
             simp_j = simplices[j]
             # Check if simp_i is a face of simp_j
             if (simp_i[0] in simp_j) and (simp_i[1] in simp_j) and i!=j:
-                delta[i,j] = 1
+                if not strict or (len(simp_i) == len(simp_j)-1 and all(v in simp_j for v in simp_i)):
+                    delta[i,j] = 1
                 
     return delta
 
@@ -179,6 +298,7 @@ def getpivotindices(A):
 def reduceboundarymat(delta):
     """
     Implementation of the standard algorithm to reduce a boundary matrix
+    (with reducekernel when numba is installed, see PHY407_Zafar_Functions_JIT)
 
     Parameters
     ----------
@@ -191,6 +311,11 @@ def reduceboundarymat(delta):
         reduced boundary matrix for a filtration of simplicial complexes
 
     """
+    if JIT_AVAILABLE:
+        # Same column additions, on a transposed 0/1 copy
+        RT = np.ascontiguousarray(delta.transpose() != 0, dtype=np.uint8)
+        reducekernel(RT)
+        return RT.transpose().astype(delta.dtype)
     # Create a copy of the boundary matrix
     delta_r = delta.copy()
     # Get pivot indices of the boundary matrix
@@ -218,6 +343,163 @@ def reduceboundarymat(delta):
                     
     return delta_r
                     
+def columnpivot(col):
+    """
+    Get the pivot (lowest nonzero row) of a bit-packed column
+
+    Parameters
+    ----------
+    col : array[uint8]
+        column packed with np.packbits(..., bitorder="little")
+
+    Returns
+    -------
+    p_idx : int
+        pivot row index (-1 if the column is zero)
+
+    """
+    nz = np.flatnonzero(col)
+    if len(nz) == 0:
+        return -1
+    p_idx = 8*int(nz[-1]) + int(col[nz[-1]]).bit_length() - 1
+
+    return p_idx
+
+def reducecolumns(cols):
+    """
+    Reduce bit-packed columns left to right with the standard algorithm
+
+    Parameters
+    ----------
+    cols : matrix[uint8], size: CxB
+        packed columns (one per row of cols), reduced in place
+
+    Returns
+    -------
+    cols : matrix[uint8], size: CxB
+        reduced columns
+    pivots : array[int], size: C
+        pivot row of each column (-1 for zero columns)
+
+    """
+    lookup = {} # pivot row --> column owning it
+    pivots = np.zeros(len(cols), dtype=np.int64)
+    for j in range(len(cols)):
+        p = columnpivot(cols[j])
+        while p != -1 and p in lookup:
+            cols[j] ^= cols[lookup[p]]
+            p = columnpivot(cols[j])
+        pivots[j] = p
+        if p != -1:
+            lookup[p] = j
+
+    return cols, pivots
+
+def reduceboundarymatparallel(delta, nworkers=None, nchunks=None):
+    """
+    Reduce a boundary matrix on several cores with the chunk algorithm
+
+    The filtration-ordered columns are split into contiguous chunks. Each chunk
+    is first reduced on its own, in parallel, using only columns of the same
+    chunk. A column whose pivot row lies inside its own chunk cannot collide
+    with any earlier chunk (the matrix is strictly upper triangular), so it is
+    final; the remaining columns are finished in one sequential global pass.
+    Every step adds a column to a later one, so the pivots -- and hence the
+    persistence pairs -- are identical to those of reduceboundarymat
+
+    Parameters
+    ----------
+    delta : matrix[int], size: NxN
+        boundary matrix for a filtration of simplicial complexes
+    nworkers : int
+        number of worker processes (None --> number of cores, 1 --> no pool)
+    nchunks : int
+        number of column chunks (None --> nworkers)
+
+    Returns
+    -------
+    delta_r : matrix[int], size: NxN
+        reduced boundary matrix for a filtration of simplicial complexes
+
+    """
+    import os
+
+    n = len(delta)
+    if nworkers is None:
+        nworkers = os.cpu_count() or 1
+    if nchunks is None:
+        nchunks = nworkers
+    nchunks = max(min(nchunks, n), 1)
+    # Pack each column into bytes, one column per row
+    cols = np.packbits(np.asarray(delta).transpose() % 2 > 0, axis=1, bitorder="little")
+    bounds = np.linspace(0, n, nchunks+1).astype(int)
+
+    # 1. Local reduction of each chunk, in parallel
+    if nworkers > 1 and nchunks > 1:
+        with ProcessPoolExecutor(max_workers=nworkers) as pool:
+            parts = list(pool.map(reducecolumns, [cols[bounds[c]:bounds[c+1]] for c in range(nchunks)]))
+    else:
+        parts = [reducecolumns(cols[bounds[c]:bounds[c+1]]) for c in range(nchunks)]
+    cols = np.concatenate([part[0] for part in parts])
+
+    # 2. Global pass over the columns not finalized locally
+    lookup = {}
+    for c in range(nchunks):
+        local = parts[c][1]
+        for i in range(len(local)):
+            j = bounds[c] + i
+            p = local[i]
+            if p >= bounds[c]:
+                lookup[p] = j
+                continue
+            while p != -1 and p in lookup:
+                cols[j] ^= cols[lookup[p]]
+                p = columnpivot(cols[j])
+            if p != -1:
+                lookup[p] = j
+
+    delta_r = np.unpackbits(cols, axis=1, count=n, bitorder="little").transpose().astype(np.asarray(delta).dtype)
+
+    return delta_r
+
+def reductionspeedup(delta, workers=(1, 2, 4), nchunks=None):
+    """
+    Time the parallel reduction for several worker counts, checking that the
+    persistence pairs match the sequential standard algorithm
+
+    Parameters
+    ----------
+    delta : matrix[int], size: NxN
+        boundary matrix for a filtration of simplicial complexes
+    workers : list[int]
+        worker counts to time
+    nchunks : int
+        number of column chunks (None --> worker count)
+
+    Returns
+    -------
+    report : list[tuple(int, float, float)]
+        (workers, seconds, speedup over the sequential reduction) per worker count
+
+    """
+    tstart = time.perf_counter()
+    delta_r = reduceboundarymatparallel(delta, 1, 1)
+    tseq = time.perf_counter() - tstart
+    reference = getpivotindices(delta_r)
+    print("-> sequential reduction: " + str(round(tseq, 3)) + " sec")
+
+    report = []
+    for w in workers:
+        tstart = time.perf_counter()
+        delta_r = reduceboundarymatparallel(delta, w, nchunks)
+        texecute = time.perf_counter() - tstart
+        if getpivotindices(delta_r) != reference:
+            raise RuntimeError("parallel reduction pivots differ with " + str(w) + " workers")
+        report.append((w, texecute, tseq/texecute))
+        print("-> " + str(w) + " workers: " + str(round(texecute, 3)) + " sec, speedup " + str(round(tseq/texecute, 2)))
+
+    return report
+
 def getintervals(delta, epsilon):
     """
     Given a reduced boundary matrix and list of indices at which simplices
@@ -258,7 +540,254 @@ def getintervals(delta, epsilon):
                 lifespan.append(death_idx-birth_idx)
             
     # Sort the intervals by lifespan length
-    int_id = np.array(lifespan).argsort()
+    # (stable, so equal lifespans keep the order of their closing simplices)
+    int_id = np.array(lifespan).argsort(kind="stable")
     intervals = np.array([intervals[i] for i in int_id])
     
-    return intervals
\ No newline at end of file
+    return intervals
+
+def flagblock(V, e0, e1):
+    """
+    Generate the simplices of the flag filtration that enter at epsilon
+    indices e0 to e1-1, in the order of flagfilt, without enumerating the rest
+
+    A triangle enters with its last edge, so the triangles of the block are
+    those of the new edges with a third vertex joined to both of their ends
+    no later than the edge itself
+
+    Parameters
+    ----------
+    V : matrix[int], size: nxn
+        epsilon index at which each edge enters (see flagfilt)
+    e0, e1 : int
+        first and one past the last epsilon index of the block
+
+    Returns
+    -------
+    simp_list : list[tuples]
+        simplices of the block as tuples of landmark indices, in flagfilt order
+    val : array[int]
+        dual array to simp_list, epsilon index of each simplex
+
+    """
+    n = len(V)
+    I, J = np.triu_indices(n, 1)
+    v = V[I,J]
+    new = (v >= e0) & (v < e1)
+    I, J, v = I[new], J[new], v[new]
+    X = (V[I,:] <= v[:,None]) & (V[J,:] <= v[:,None])
+    X[np.arange(len(I)), I] = False
+    X[np.arange(len(I)), J] = False
+    e, x = np.nonzero(X)
+    # A triangle whose last edges tie is found once per tied edge
+    T = np.unique(np.sort(np.column_stack((I[e], J[e], x)), axis=1), axis=0).reshape(-1, 3)
+    tval = np.maximum(np.maximum(V[T[:,0],T[:,1]], V[T[:,0],T[:,2]]), V[T[:,1],T[:,2]])
+    val = np.concatenate((v, tval))
+    dim = np.concatenate((np.ones(len(I), dtype=np.int64), np.full(len(T), 2)))
+    S = np.vstack((np.column_stack((I, J, np.full(len(I), -1))), T))
+    # By entry value, then edges before triangles, then combination order
+    order = np.lexsort((S[:,2], S[:,1], S[:,0], dim, val))
+    simp_list = [tuple(int(u) for u in S[o,:dim[o]+1]) for o in order]
+    val = val[order]
+
+    return simp_list, val
+
+def cyclefill(simplices, E, epsilon, forest=None, offset=0):
+    """
+    Bound the death of every hole that an edge can open
+
+    A non-tree edge [a,b] opens the cycle made of itself and the forest path
+    from a to b when it enters. That cycle, and so the hole the edge opens, is
+    filled once some landmark v is joined to all of its vertices (the cone of
+    the cycle from v is then in the complex), i.e. at the first epsilon above
+    the largest of these edge values
+
+    Parameters
+    ----------
+    simplices : list[tuples], length: K
+        filtration of landmark index tuples (see flagfilt), or the next block
+        of it (see flagblock)
+    E : matrix[float], size: nxn
+        entry value of each edge
+    epsilon : array[float]
+        epsilon grid of the filtration
+    forest : tuple(list, list)
+        spanning forest of the earlier blocks, as returned by the previous call
+        (None --> start from the empty forest)
+    offset : int
+        filtration position of the first simplex in simplices
+
+    Returns
+    -------
+    fill : dict
+        filtration position of each non-tree edge --> epsilon index by which
+        its hole is filled (len(epsilon)-1 if not within the grid)
+    forest : tuple(list, list)
+        spanning forest after simplices: neighbours and union-find parent of
+        each landmark
+
+    """
+    n = len(E)
+    if forest is None:
+        forest = ([[] for v in range(n)], list(range(n)))
+    adjacent, parent = forest
+
+    def root(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    fill = {}
+    for pos, simp in enumerate(simplices, offset):
+        if len(simp) != 2:
+            continue
+        a, b = simp
+        ra, rb = root(a), root(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+            adjacent[a].append(b)
+            adjacent[b].append(a)
+            continue
+        # Forest path from a to b (breadth-first)
+        prev = {a: a}
+        queue = [a]
+        for v in queue:
+            for w in adjacent[v]:
+                if w not in prev:
+                    prev[w] = v
+                    queue.append(w)
+        cycle = [b]
+        while cycle[-1] != a:
+            cycle.append(prev[cycle[-1]])
+        # Cone the cycle from the landmark closest to all of its vertices
+        cone = max(E[:,cycle].max(axis=1).min(), E[a,b])
+        fill[pos] = min(int(np.searchsorted(epsilon, cone, side="right")), len(epsilon)-1)
+
+    return fill, forest
+
+def adaptivepersistence(start, end, step, E, k, block=10):
+    """
+    Compute the k longest homology intervals of the flag filtration of an edge
+    value matrix, generating and reducing the filtration one block of epsilon
+    values at a time and stopping once no later simplex can change them
+
+    The boundary matrix is the standard one (createboundarymat with
+    strict=True, as cohomologyintervals): under the original face rule no
+    death can be bounded early, so persistenthomology only takes this path
+    with strict=True.
+    Each block only appends columns (and rows) to the boundary matrix, so the
+    pairs found so far are those of the full reduction. After each block every
+    hole still open, or yet to open, has its lifespan bounded: a hole can only
+    be opened by a non-tree edge, and is filled by the bound of cyclefill; an
+    edge yet to enter is filled once some landmark is joined to every other.
+    Once k finished intervals are strictly longer than every such bound (or no
+    bound is positive), the last k rows of the result equal those of
+    getintervals on the full filtration
+
+    Parameters
+    ----------
+    start : float
+        smallest epsilon to use in the filtration
+    end : float
+        largest epsilon to use in the filtration
+    step : float
+        step size for epsilon to use in the filtration
+    E : matrix[float], size: nxn
+        entry value of each edge, e.g. landmark distances or lazywitness values
+    k : int
+        number of longest intervals that must be exact
+    block : int
+        number of epsilon values added per block
+
+    Returns
+    -------
+    intervals : array[float], size: Kx2
+        finished homology intervals, sorted as getintervals (the last k rows
+        are exact; shorter intervals may be missing)
+    stats : dict
+        'simplices' --> simplices built and reduced
+        'total' --> simplices in the full filtration
+        'cutoff' --> last epsilon built
+        'seconds' --> time spent building and reducing
+
+    """
+    tstart = time.perf_counter()
+    epsilon = np.arange(start,end+step,step)
+    n = len(E)
+    # An edge enters at the first epsilon strictly above its value
+    V = np.searchsorted(epsilon, E, side="right")
+    # Every hole is filled once some landmark is joined to all the others
+    cone = min(int(V.max(axis=1, initial=0).min(initial=len(epsilon))), len(epsilon)-1)
+    edgeval = np.sort(V[np.triu_indices(n, 1)])
+    # Size of the full filtration: entering edges, and triangles of them
+    A = (V < len(epsilon)).astype(np.float64)
+    np.fill_diagonal(A, 0)
+    total = int(round(A.sum()/2 + np.trace(A @ A @ A)/6))
+
+    simplices = []
+    e_list = []
+    val = []
+    index = {} # simplex --> filtration position
+    cols = [] # column j packed with np.packbits(..., bitorder="little"), rows 0..j
+    pivots = []
+    lookup = {} # pivot row --> column owning it
+    fill = {}
+    forest = None
+    cutoff = start
+    for e0 in range(0, len(epsilon), block):
+        e1 = min(e0+block, len(epsilon))
+        S, sval = flagblock(V, e0, e1)
+        blockfill, forest = cyclefill(S, E, epsilon, forest, len(simplices))
+        fill.update(blockfill)
+        # Build and reduce the columns of the block against the earlier ones
+        for simp, sv in zip(S, sval):
+            j = len(simplices)
+            simplices.append(simp)
+            e_list.append(epsilon[sv])
+            val.append(int(sv))
+            index[simp] = j
+            bits = np.zeros(j+1, dtype=bool)
+            if len(simp) == 3:
+                a, b, c = simp
+                bits[[index[(a, b)], index[(a, c)], index[(b, c)]]] = True
+            col = np.packbits(bits, bitorder="little")
+            piv = columnpivot(col)
+            while piv != -1 and piv in lookup:
+                other = cols[lookup[piv]]
+                col[:len(other)] ^= other
+                piv = columnpivot(col)
+            cols.append(col)
+            pivots.append(piv)
+            if piv != -1:
+                lookup[piv] = j
+        cutoff = epsilon[e1-1]
+        if len(simplices) == total:
+            break
+
+        # Largest lifespan any unfinished interval can still have
+        bounds = [epsilon[f] - epsilon[val[pos]] for pos, f in fill.items() if pos not in lookup]
+        later = edgeval[np.searchsorted(edgeval, e1):]
+        if len(later) and later[0] < len(epsilon):
+            bounds.append(epsilon[cone] - epsilon[later[0]])
+        bound = max(bounds, default=0)
+        lifespans = [e_list[j] - e_list[pivots[j]] for j in range(len(simplices)) if pivots[j] > -1]
+        if bound <= 0 or sum(l > bound for l in lifespans) >= k:
+            break
+
+    # Same order and filtering as getintervals
+    intervals = []
+    lifespan = []
+    for j in range(len(simplices)):
+        if pivots[j] > -1:
+            birth_idx = e_list[pivots[j]]
+            death_idx = e_list[j]
+            if death_idx-birth_idx>0:
+                intervals.append((birth_idx, death_idx))
+                lifespan.append(death_idx-birth_idx)
+    int_id = np.array(lifespan).argsort(kind="stable")
+    intervals = np.array([intervals[i] for i in int_id])
+    stats = {"simplices": len(simplices), "total": total, "cutoff": cutoff,
+             "seconds": time.perf_counter() - tstart}
+
+    return intervals, stats
@@ -6,6 +6,7 @@ Authors:
 """
 
 from PHY407_Zafar_Functions_Helper import norm
+from PHY407_Zafar_Functions_JIT import JIT_AVAILABLE, assignmentkernel
 import numpy as np
 from itertools import permutations
 
@@ -86,11 +87,10 @@ def createbipartitematrix(set1, set2):
         bipartite distance matrix between each interval in set1 to set2
 
     """
-    n = len(set1)
-    D = np.zeros((n,n))
-    for i in range(n):
-        for j in range(n):
-            D[i,j] = norm(tuple(set1[i,:]),tuple(set2[j,:]))
+    set1 = np.asarray(set1, dtype=np.float64).reshape(-1, 2)
+    set2 = np.asarray(set2, dtype=np.float64).reshape(-1, 2)
+    # Same arithmetic as norm, for every pair at once
+    D = np.sqrt((set1[:,None,0]-set2[None,:,0])**2 + (set1[:,None,1]-set2[None,:,1])**2)
             
     return D
 
@@ -242,3 +242,224 @@ def wassersteindistpairwise(set1, set2, pair):
         distance += distAB
         
     return distance
+
+def optimalassignment(D):
+    """
+    Solve the linear assignment problem given by cost matrix D exactly, with
+    the shortest augmenting path form of the Hungarian algorithm (dual
+    potentials on rows and columns, one augmenting path per row); with
+    assignmentkernel when numba is installed (see PHY407_Zafar_Functions_JIT)
+
+    Parameters
+    ----------
+    D : matrix[float], size: KxK
+        square, bipartite cost matrix representing linear assignment problem
+
+    Returns
+    -------
+    A : array[int], K
+        array of column indices which are paired with the corresponding row index
+         --> A[0] is the column which is paired with the 0-th row
+
+    """
+    D = np.asarray(D, dtype=np.float64)
+    if JIT_AVAILABLE:
+        return assignmentkernel(np.ascontiguousarray(D)).astype(int)
+    n = len(D)
+    # Potentials and matching, with a virtual column 0 as the path root
+    u = np.zeros(n+1)
+    v = np.zeros(n+1)
+    p = np.zeros(n+1, dtype=int) # row (1-based) matched to each column
+    way = np.zeros(n+1, dtype=int) # previous column on the augmenting path
+    for i in range(1, n+1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(n+1, np.inf)
+        used = np.zeros(n+1, dtype=bool)
+        # Grow the alternating tree until it reaches a free column
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            cur = D[i0-1,:] - u[i0] - v[1:]
+            upd = ~used[1:] & (cur < minv[1:])
+            minv[1:][upd] = cur[upd]
+            way[1:][upd] = j0
+            free = np.where(~used[1:])[0] + 1
+            j1 = free[np.argmin(minv[free])]
+            delta = minv[j1]
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[~used] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        # Augment along the path
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    A = np.zeros((n), dtype=int)
+    A[p[1:]-1] = np.arange(n)
+
+    return A
+
+def hopcroftkarp(adj, nbrs=None):
+    """
+    Maximum bipartite matching with the Hopcroft-Karp algorithm
+
+    Parameters
+    ----------
+    adj : matrix[bool], size: KxK
+        adj[i,j] is True if row i may be paired with column j
+    nbrs : list[array[int]], length: K
+        columns each row may be paired with, used instead of the entries of
+        adj when given (adj then only gives the shape)
+
+    Returns
+    -------
+    size : int
+        number of pairs in a maximum matching
+    A : array[int], K
+        column paired with each row, -1 if the row is unpaired
+
+    """
+    n, m = adj.shape
+    if nbrs is None:
+        nbrs = [np.nonzero(adj[i,:])[0] for i in range(n)]
+    A = np.full(n, -1)
+    R = np.full(m, -1)
+    size = 0
+
+    def augment(i, dist):
+        # Depth-first search for an augmenting path along the BFS layers
+        for j in nbrs[i]:
+            r = R[j]
+            if r == -1 or (dist[r] == dist[i] + 1 and augment(r, dist)):
+                A[i] = j
+                R[j] = i
+                return True
+        dist[i] = np.inf
+        return False
+
+    while True:
+        # Breadth-first layering from the free rows
+        dist = np.full(n, np.inf)
+        queue = list(np.where(A == -1)[0])
+        dist[queue] = 0
+        found = False
+        for i in queue:
+            for j in nbrs[i]:
+                r = R[j]
+                if r == -1:
+                    found = True
+                elif dist[r] == np.inf:
+                    dist[r] = dist[i] + 1
+                    queue.append(r)
+        if not found:
+            break
+        for i in np.where(A == -1)[0]:
+            if augment(i, dist):
+                size += 1
+
+    return size, A
+
+def bottleneckdist(D, k1):
+    """
+    Compute the bottleneck cost of a bipartite cost matrix: the smallest t such
+    that a perfect matching uses only pairs of cost <= t
+
+    The candidate values of t are pruned to those between a lower bound (every
+    row and column must be paired with at least its cheapest partner) and an
+    upper bound (the cost of pairing each interval with its own diagonal
+    projection), and are then binary searched with a Hopcroft-Karp check.
+    Pairs costing more than the upper bound are pruned once; each row keeps
+    its remaining columns sorted by cost, so the graph of every threshold is
+    a prefix of those lists
+
+    Parameters
+    ----------
+    D : matrix[float], size: (K1+K2)x(K1+K2)
+        bipartite cost matrix between the exchanged sets [B1; B2D] and
+        [B2; B1D] (see exchangediagonals, createbipartitematrix)
+    k1 : int
+        number of intervals K1 in B1
+
+    Returns
+    -------
+    distance : float
+        bottleneck distance
+
+    """
+    n = len(D)
+    if n == 0:
+        return 0.0
+    lower = max(D.min(axis=1).max(), D.min(axis=0).max())
+    # For the exchanged sets [B1; B2D] and [B2; B1D] the pairing
+    # B1[i] --> B1D[i], B2D[j] --> B2[j] is always perfect
+    k2 = n - k1
+    upper = max(np.max(D[np.arange(k1), k2+np.arange(k1)], initial=0),
+                np.max(D[k1+np.arange(k2), np.arange(k2)], initial=0))
+    cand = np.unique(D[(D >= lower) & (D <= upper)])
+    # Candidate pairs of each row, cheapest first, without those above upper
+    order = np.argsort(D, axis=1, kind="stable")
+    cost = np.take_along_axis(D, order, axis=1)
+    keep = [order[i,:np.searchsorted(cost[i], upper, side="right")] for i in range(n)]
+    kcost = [cost[i,:len(keep[i])] for i in range(n)]
+    lo, hi = 0, len(cand) - 1
+    while lo < hi:
+        mid = (lo + hi) // 2
+        nbrs = [keep[i][:np.searchsorted(kcost[i], cand[mid], side="right")] for i in range(n)]
+        size, A = hopcroftkarp(D, nbrs)
+        if size == n:
+            hi = mid
+        else:
+            lo = mid + 1
+    distance = cand[lo]
+
+    return distance
+
+def wassersteinpair(B1, B2, metric="W1"):
+    """
+    Compute the distance between two sets of homology intervals
+
+    Parameters
+    ----------
+    B1 : array[float], size: Kx2
+        array of the K homology intervals
+    B2 : array[float], size: Kx2
+        array of the K homology intervals
+    metric : string
+        'W1' --> Wasserstein distance: sum of the matched pair distances
+        'W2' --> 2-Wasserstein distance: root of the sum of squared pair distances
+        'bottleneck' --> bottleneck distance: largest matched pair distance
+
+    Returns
+    -------
+    dist : float
+        distance between B1 and B2
+
+    """
+    # 1. Project intervals onto diagonal
+    B1D, B2D = projectdiagonals(B1,B2)
+    # 2. Exchange intervals and diagonals
+    B1_B2D, B2_B1D = exchangediagonals(B1, B2, B1D, B2D)
+    # 3. Create bipartite cost matrix
+    Cost = createbipartitematrix(B1_B2D, B2_B1D)
+    if metric == "bottleneck":
+        # 4. Binary search the smallest feasible largest pair distance
+        dist = bottleneckdist(Cost, len(B1))
+    elif metric == "W1":
+        # 4. Find the optimal assignment
+        pair = optimalassignment(Cost)
+        # 5. Compute distance
+        dist = wassersteindistpairwise(B1_B2D, B2_B1D, pair)
+    elif metric == "W2":
+        # 4. Find the optimal assignment for squared distances
+        pair = optimalassignment(Cost**2)
+        # 5. Compute distance
+        dist = np.sqrt(np.sum(Cost[np.arange(len(Cost)), pair]**2))
+    else:
+        raise ValueError("unknown metric: " + str(metric))
+
+    return dist
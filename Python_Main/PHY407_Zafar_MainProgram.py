@@ -6,6 +6,7 @@ Authors:
 """
 from PHY407_Zafar_Functions_Main import *
 from PHY407_Zafar_Functions_Plot import *
+from PHY407_Zafar_Functions_Graph import *
 import numpy as np
 import matplotlib.pyplot as plt
 
@@ -45,6 +46,8 @@ step = 0.01 # Step size for filtration
 # Wasserstein computation parameters
 k = 3 # Use the k largest intervals for comparison
 A_thresh = 0.5 # Set adjacency threshold at 0.5 (50%)
+# Grouping parameters
+knn = 2 # Number of nearest neighbours kept per trial in the sparse graph
 
 # PARSE DATA FILES AND COMPUTE CONTINUOUS RELATIVE PHASE
 for i in range(len(filenames)):
@@ -85,6 +88,12 @@ A = np.zeros((len(W),len(W)))
 # Compute adjacency matrix
 A[W<A_thresh] = 1
 np.fill_diagonal(A, 0)
+
+# GROUP TRIALS ON A SPARSE K-NEAREST-NEIGHBOUR GRAPH
+G = knngraph(W, len(W), knn)
+groups = connectedcomponents(G, A_thresh)
+for g in range(max(groups)+1):
+    print("Group " + str(g) + ": " + str([data_labels[i] for i in np.where(groups==g)[0]]))
     
 #% Plots
 plotcrp(crp, data_labels)
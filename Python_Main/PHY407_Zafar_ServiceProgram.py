@@ -0,0 +1,68 @@
+"""
+SERVICE PROGRAM
+PHY 407 - Gait Distinction via Hip-Knee Coordination
+Authors:
+        Abdullah Zafar, 999730411
+"""
+from PHY407_Zafar_Functions_Service import *
+from PHY407_Zafar_Functions_Batch import loadmanifest, crpjob
+import numpy as np
+import argparse
+import asyncio
+import json
+
+def referenceservice(manifest, nworkers=None, maxqueue=64, datadir=None):
+    """
+    Create a service whose reference gaits are the trials of a batch manifest,
+    normalized on the CRP ranges of those trials as in MainProgram
+
+    Parameters
+    ----------
+    manifest : string
+        JSON manifest of reference files and parameters (see loadmanifest)
+    nworkers, maxqueue, datadir : int, int, string
+        service options (see createservice)
+
+    Returns
+    -------
+    service : dict
+        service state, to pass to runservice
+
+    """
+    manifest = loadmanifest(manifest)
+    params = manifest["params"]
+    X = [crpjob(file, label) for file, label in zip(manifest["files"], manifest["labels"])]
+    xminmax = [min(x[0].min() for x in X), max(x[0].max() for x in X)]
+    yminmax = [min(x[1].min() for x in X), max(x[1].max() for x in X)]
+    reference = [trialdiagram(np.loadtxt(file), xminmax, yminmax, params["nlandmarks"],
+                              params["start"], params["step"], params["end"])
+                 for file in manifest["files"]]
+    service = createservice(manifest["labels"], reference, xminmax, yminmax, params["nlandmarks"],
+                            params["start"], params["step"], params["end"], params["k"],
+                            nworkers, maxqueue, datadir)
+
+    return service
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Long-running gait analysis service, or a client of one")
+    parser.add_argument("address", help="'unix:/path/to/socket' or 'host:port'")
+    parser.add_argument("--manifest", default=None, help="serve: JSON manifest of the reference trials")
+    parser.add_argument("--jobs", type=int, default=None, help="serve: number of worker processes (default: number of cores)")
+    parser.add_argument("--maxqueue", type=int, default=64, help="serve: largest number of queued trials")
+    parser.add_argument("--datadir", default=None, help="serve: directory 'submitfile' requests may read from (default: disabled)")
+    parser.add_argument("--submit", nargs="+", default=None, help="client: recordings to analyse")
+    parser.add_argument("--stats", action="store_true", help="client: print the service latency statistics")
+    parser.add_argument("--drain", action="store_true", help="client: finish queued trials and stop the service")
+    args = parser.parse_args()
+
+    if args.submit:
+        raws = [np.loadtxt(file) for file in args.submit]
+        for file, reply in zip(args.submit, asyncio.run(submittrials(args.address, raws, args.submit))):
+            print(file + ": " + json.dumps({key: reply[key] for key in reply if key != "intervals"}))
+    elif args.stats or args.drain:
+        print(json.dumps(asyncio.run(requestservice(args.address, "drain" if args.drain else "stats")), indent=1))
+    elif args.manifest:
+        service = referenceservice(args.manifest, args.jobs, args.maxqueue, args.datadir)
+        asyncio.run(runservice(service, args.address))
+    else:
+        parser.error("give --manifest to serve, or one of --submit/--stats/--drain")
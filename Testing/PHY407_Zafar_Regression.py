@@ -0,0 +1,409 @@
+"""
+DIFFERENTIAL CORRECTNESS AND SPEED REGRESSION TESTS
+PHY 407 - Gait Distinction via Hip-Knee Coordination
+Authors:
+        Abdullah Zafar, 999730411
+
+Compares every fast path against the reference implementations on random
+point clouds and the five Data/ trials, then times the hot paths against a
+stored baseline. Timings are stored as multiples of a fixed reference
+workload timed in the same run, so the baseline carries across machines.
+Exits with status 1 on any mismatch or slowdown
+
+Usage:
+    python PHY407_Zafar_Regression.py [--tolerance 0.5] [--update-baseline]
+"""
+import os
+import sys
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "Python_Main"))
+
+from PHY407_Zafar_Functions_Main import *
+from PHY407_Zafar_Functions_Cohomology import landmarkdistances, cohomologyintervals
+from PHY407_Zafar_Functions_BatchHomology import batchpersistence
+from PHY407_Zafar_Functions_Sinkhorn import sinkhorndist
+from PHY407_Zafar_Functions_Bounds import thresholdadjacency
+from PHY407_Zafar_Functions_Cycles import detectcycles, cycleanalysis
+import PHY407_Zafar_Functions_Topology as Topology
+import PHY407_Zafar_Functions_Wasserstein as Wasserstein
+import PHY407_Zafar_Functions_JIT as JIT
+from itertools import permutations
+import numpy as np
+import contextlib
+import argparse
+import json
+import time
+import io
+
+# Stored timings relative to referencework, one section per backend ('jit' or 'numpy')
+BASELINE_FILE = os.path.join(HERE, "PHY407_Zafar_Baseline.json")
+# Slowdowns below this many seconds are taken as timer noise
+BASELINE_SLACK = 0.002
+
+# Parameters of MainProgram
+DATA_FILES = ['data_sprint_1.txt', 'data_sprint_2.txt', 'data_sprint_para_1.txt',
+              'data_mar_1.txt', 'data_mar_2.txt']
+START, STEP, END, K = 0, 0.01, 3, 3
+
+@contextlib.contextmanager
+def referencebackend():
+    """
+    Run the enclosed code with the pure-NumPy implementations, even when the
+    compiled kernels are available
+    """
+    saved = (Topology.JIT_AVAILABLE, Wasserstein.JIT_AVAILABLE)
+    Topology.JIT_AVAILABLE = Wasserstein.JIT_AVAILABLE = False
+    try:
+        yield
+    finally:
+        Topology.JIT_AVAILABLE, Wasserstein.JIT_AVAILABLE = saved
+
+def quiet(func, *args, **kwargs):
+    """
+    Call func without its progress output
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+def loadclouds(nrandom, seed):
+    """
+    Build the test point clouds: the five Data/ trials normalized as in
+    MainProgram, then noisy random loops
+
+    Parameters
+    ----------
+    nrandom : int
+        number of random clouds
+    seed : int
+        seed of the random clouds
+
+    Returns
+    -------
+    clouds : list[tuple(string, list[tuples], int)]
+        label, points and number of landmarks of each cloud
+
+    """
+    crp = []
+    for f in DATA_FILES:
+        raw = np.loadtxt(os.path.join(HERE, "..", "Data", f))
+        crp.append(quiet(continuousrelphase, raw, f))
+    xminmax = [min(min(x) for x, xdot in crp), max(max(x) for x, xdot in crp)]
+    yminmax = [min(min(xdot) for x, xdot in crp), max(max(xdot) for x, xdot in crp)]
+    clouds = [(f, gennormpoints(x, xdot, xminmax, yminmax), 10) for f, (x, xdot) in zip(DATA_FILES, crp)]
+
+    rng = np.random.default_rng(seed)
+    for c in range(nrandom):
+        n = int(rng.integers(40, 200))
+        t = rng.random(n)*2*np.pi
+        x = np.cos(t)*rng.uniform(0.3, 1) + rng.normal(0, 0.1, n)
+        y = np.sin(t)*rng.uniform(0.3, 1) + rng.normal(0, 0.1, n)
+        clouds.append(("random_" + str(c), gennormpoints(x, y, [x.min(), x.max()], [y.min(), y.max()]),
+                       int(rng.integers(5, 9))))
+
+    return clouds
+
+def check(results, name, ok):
+    """
+    Record the result of one comparison
+    """
+    results.append((name, bool(ok)))
+    if not ok:
+        print("FAIL: " + name)
+
+def sameintervals(I, J, k=None):
+    """
+    True if two interval arrays are identical (in their last k rows if given)
+    """
+    I = np.asarray(I, dtype=np.float64).reshape(-1, 2)
+    J = np.asarray(J, dtype=np.float64).reshape(-1, 2)
+    if k is not None:
+        I, J = I[-k:], J[-k:]
+    return I.shape == J.shape and np.array_equal(I, J)
+
+def cycletests(results):
+    """
+    Run the gait-cycle segmentation on the Data/ trials: each recording is
+    about one stride, so each must give one cycle whose batched intervals
+    match the reference path, and the five recordings joined end to end must
+    split at their five hip maxima
+
+    Parameters
+    ----------
+    results : list[tuple(string, bool)]
+        comparison results, appended to (see check)
+
+    """
+    raws = [np.loadtxt(os.path.join(HERE, "..", "Data", f)) for f in DATA_FILES]
+    for f, raw in zip(DATA_FILES, raws):
+        boundaries, crp, crpdot, intervals = quiet(cycleanalysis, raw, 200, 10, START, STEP, END)
+        check(results, f + ": cycleanalysis cycles", len(crp) == 1)
+        if len(crp) != 1:
+            continue
+        points = gennormpoints(crp[0], crpdot[0], [crp.min(), crp.max()], [crpdot.min(), crpdot.max()])
+        with referencebackend():
+            pointsL = witnesscomplex(points, 10)
+            S, E = vrfilt(START, END, STEP, pointsL)
+            refI = getintervals(reduceboundarymat(createboundarymat(S)), E)
+        if len(set(pointsL)) == len(pointsL):
+            check(results, f + ": cycleanalysis intervals", sameintervals(intervals[0], refI))
+
+    joined = np.vstack(raws)
+    offsets = np.cumsum([0] + [len(raw) for raw in raws[:-1]])
+    peaks = [o + detectcycles(raw)[0] for o, raw in zip(offsets, raws)]
+    boundaries = quiet(cycleanalysis, joined, 200, 10, START, STEP, END)[0]
+    check(results, "joined recordings: cycleanalysis boundaries", list(boundaries) == peaks)
+
+def topktests(results):
+    """
+    Check persistenthomology with topk on the Data/ trials: its last k rows
+    must equal those of the full computation with strict=True, and topk
+    without strict must be refused
+
+    Parameters
+    ----------
+    results : list[tuple(string, bool)]
+        comparison results, appended to (see check)
+
+    """
+    crp = [quiet(continuousrelphase, np.loadtxt(os.path.join(HERE, "..", "Data", f)), f) for f in DATA_FILES]
+    xminmax = [min(min(x) for x, xdot in crp), max(max(x) for x, xdot in crp)]
+    yminmax = [min(min(xdot) for x, xdot in crp), max(max(xdot) for x, xdot in crp)]
+    for f, (x, xdot) in zip(DATA_FILES, crp):
+        args = (x, xdot, xminmax, yminmax, 10, START, STEP, END, False, f)
+        full = quiet(persistenthomology, *args, strict=True)
+        for k in (1, K):
+            check(results, f + ": persistenthomology topk=" + str(k),
+                  sameintervals(quiet(persistenthomology, *args, topk=k, strict=True), full, k))
+        try:
+            quiet(persistenthomology, *args, topk=K)
+            refused = False
+        except ValueError:
+            refused = True
+        check(results, f + ": persistenthomology topk without strict", refused)
+
+def differentialtests(clouds, seed):
+    """
+    Compare every fast path with its reference implementation
+
+    Parameters
+    ----------
+    clouds : list[tuple(string, list[tuples], int)]
+        test clouds (see loadclouds)
+    seed : int
+        seed of the random assignment problems
+
+    Returns
+    -------
+    failures : list[string]
+        name of each failed comparison
+    ncompared : int
+        number of comparisons made
+
+    """
+    results = []
+    intervals = []
+    for label, points, nland in clouds:
+        # Landmarks: compiled max-min against the NumPy loop
+        pointsL = witnesscomplex(points, nland)
+        with referencebackend():
+            refL = witnesscomplex(points, nland)
+        check(results, label + ": witnesscomplex", pointsL == refL)
+
+        # Filtration: vrfilt against flagfilt on the landmark distances
+        S, E = vrfilt(START, END, STEP, refL)
+        D = landmarkdistances(refL)
+        S2, E2 = flagfilt(START, END, STEP, D)
+        check(results, label + ": flagfilt", [tuple(refL[v] for v in s) for s in S2] == S and list(E2) == list(E))
+
+        # Reduction: every engine against the NumPy standard algorithm
+        with referencebackend():
+            for strict in (False, True):
+                delta = createboundarymat(S, strict)
+                reference = reduceboundarymat(delta)
+                refI = getintervals(reference, E)
+                tag = label + (": strict " if strict else ": ")
+                if strict:
+                    check(results, tag + "cohomologyintervals", sameintervals(cohomologyintervals(D, START, STEP, END), refI))
+                    for k in (1, K):
+                        check(results, tag + "adaptivepersistence k=" + str(k),
+                              sameintervals(adaptivepersistence(START, END, STEP, D, k)[0], refI, k))
+                else:
+                    refdiagram = refI
+                    if len(set(refL)) == len(refL):
+                        check(results, tag + "batchpersistence",
+                              sameintervals(batchpersistence(np.array([refL]), START, STEP, END)[0], refI))
+                check(results, tag + "reduceboundarymatparallel",
+                      getpivotindices(reduceboundarymatparallel(delta, 1, 2)) == getpivotindices(reference))
+        if JIT.JIT_AVAILABLE:
+            delta = createboundarymat(S)
+            fast = reduceboundarymat(delta)
+            with referencebackend():
+                check(results, label + ": reduceboundarymat", np.array_equal(fast, reduceboundarymat(delta)))
+        intervals.append(refdiagram)
+
+    # Gait cycles: segmentation and batched analysis of the Data/ trials
+    cycletests(results)
+    # Early stopping: top-k intervals of persistenthomology
+    topktests(results)
+
+    # Assignment: optimal cost against brute force on small problems
+    rng = np.random.default_rng(seed)
+    for t in range(100):
+        n = int(rng.integers(1, 7))
+        C = np.round(rng.random((n, n))*4, int(rng.integers(0, 3)))
+        best = min(C[np.arange(n), list(p)].sum() for p in permutations(range(n)))
+        A = optimalassignment(C)
+        check(results, "optimalassignment " + str(t), sorted(A) == list(range(n)) and
+              np.isclose(C[np.arange(n), A].sum(), best, rtol=0, atol=1e-9))
+        with referencebackend():
+            check(results, "optimalassignment reference " + str(t), np.array_equal(A, optimalassignment(C)))
+
+    # Wasserstein pipeline: distances and adjacency of every engine
+    W = quiet(wassersteindist, intervals, K)
+    with referencebackend():
+        check(results, "wassersteindist", np.array_equal(W, quiet(wassersteindist, intervals, K)))
+    Aref = np.zeros(W.shape)
+    Aref[W/np.max(W) < 0.5] = 1
+    np.fill_diagonal(Aref, 0)
+    check(results, "thresholdadjacency", np.array_equal(quiet(thresholdadjacency, intervals, K)[0], Aref))
+    check(results, "sinkhorndist", np.array_equal(quiet(sinkhorndist, intervals, K)[2], Aref))
+
+    failures = [name for name, ok in results if not ok]
+
+    return failures, len(results)
+
+def timed(func, *args, repeat=3):
+    """
+    Best wall time of repeated calls, in seconds
+    """
+    best = np.inf
+    for r in range(repeat):
+        tstart = time.perf_counter()
+        quiet(func, *args)
+        best = min(best, time.perf_counter() - tstart)
+    return best
+
+def referencework():
+    """
+    Fixed workload, independent of the code under test, mixing interpreted
+    loops and NumPy calls like the hot paths do
+    """
+    X = np.random.default_rng(0).random((400, 400))
+    total = 0.0
+    for i in range(300000):
+        total += (i % 7)*0.5
+    return np.sort(X, axis=1) @ X, total
+
+def timehotpaths(clouds):
+    """
+    Time the hot paths on the Data/ trials with the active backend
+
+    Parameters
+    ----------
+    clouds : list[tuple(string, list[tuples], int)]
+        test clouds (see loadclouds); the first five are the Data/ trials
+
+    Returns
+    -------
+    timings : dict
+        hot path --> seconds
+    reference : float
+        seconds of referencework
+
+    """
+    reference = timed(referencework, repeat=5)
+    trials = clouds[:len(DATA_FILES)]
+    landmarks = [witnesscomplex(points, nland) for label, points, nland in trials]
+    filtrations = [vrfilt(START, END, STEP, L) for L in landmarks]
+    boundaries = [createboundarymat(S) for S, E in filtrations]
+    reduced = [reduceboundarymat(delta) for delta in boundaries]
+    intervals = [getintervals(R, E) for R, (S, E) in zip(reduced, filtrations)]
+    distances = [landmarkdistances(L) for L in landmarks]
+    timings = {
+        "witnesscomplex": timed(lambda: [witnesscomplex(points, nland) for label, points, nland in trials]),
+        "vrfilt": timed(lambda: [vrfilt(START, END, STEP, L) for L in landmarks]),
+        "flagfilt": timed(lambda: [flagfilt(START, END, STEP, D) for D in distances]),
+        "createboundarymat": timed(lambda: [createboundarymat(S) for S, E in filtrations]),
+        "reduceboundarymat": timed(lambda: [reduceboundarymat(delta) for delta in boundaries]),
+        "getintervals": timed(lambda: [getintervals(R, E) for R, (S, E) in zip(reduced, filtrations)]),
+        "adaptivepersistence": timed(lambda: [adaptivepersistence(START, END, STEP, D, K) for D in distances]),
+        "cohomologyintervals": timed(lambda: [cohomologyintervals(D, START, STEP, END) for D in distances]),
+        "batchpersistence": timed(lambda: batchpersistence(np.array(landmarks), START, STEP, END)),
+        "wassersteindist": timed(lambda: wassersteindist(intervals, K)),
+        "thresholdadjacency": timed(lambda: thresholdadjacency(intervals, K)),
+        }
+
+    return timings, reference
+
+def comparebaseline(timings, reference, backend, tolerance, update):
+    """
+    Compare timings, as multiples of the reference time, with the stored
+    baseline of the backend
+
+    Parameters
+    ----------
+    timings : dict
+        hot path --> seconds
+    reference : float
+        seconds of referencework in this run
+    backend : string
+        'jit' or 'numpy'
+    tolerance : float
+        largest accepted relative slowdown (0.5 --> 50% slower)
+    update : boolean
+        True --> store the relative timings as the new baseline
+
+    Returns
+    -------
+    slower : list[string]
+        hot paths slower than the baseline beyond the tolerance
+
+    """
+    baseline = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE) as f:
+            baseline = json.load(f)
+    stored = baseline.get(backend, {})
+    relative = {name: t/reference for name, t in timings.items()}
+    print("-> reference workload: " + str(round(1e3*reference, 2)) + " ms")
+    slower = []
+    for name, r in relative.items():
+        if name in stored:
+            limit = stored[name]*(1 + tolerance) + BASELINE_SLACK/reference
+            status = "SLOWER" if r > limit else "ok"
+            if r > limit:
+                slower.append(name)
+            print("-> " + name + ": " + str(round(r, 3)) + "x reference (baseline " + str(round(stored[name], 3))
+                  + "x) " + status)
+        else:
+            print("-> " + name + ": " + str(round(r, 3)) + "x reference (no baseline)")
+    if update or not stored:
+        baseline[backend] = {name: round(r, 4) for name, r in relative.items()}
+        with open(BASELINE_FILE, "w") as f:
+            json.dump(baseline, f, indent=4, sort_keys=True)
+        print("-> baseline for " + backend + " written to " + BASELINE_FILE)
+
+    return slower
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Differential correctness and speed regression tests")
+    parser.add_argument("--random", type=int, default=20, help="number of random point clouds")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random inputs")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="accepted relative slowdown")
+    parser.add_argument("--update-baseline", action="store_true", help="store the timings as the new baseline")
+    args = parser.parse_args()
+
+    backend = "jit" if JIT.JIT_AVAILABLE else "numpy"
+    print("---- REGRESSION TESTS: " + backend + " backend ----")
+    JIT.warmup()
+    clouds = loadclouds(args.random, args.seed)
+    failures, ncompared = differentialtests(clouds, args.seed)
+    print("-> " + str(ncompared) + " comparisons, " + str(len(failures)) + " failed")
+    print("---- TIMING HOT PATHS ----")
+    timings, reference = timehotpaths(clouds)
+    slower = comparebaseline(timings, reference, backend, args.tolerance, args.update_baseline)
+
+    if failures or slower:
+        print("FAILED: " + str(len(failures)) + " mismatches, " + str(len(slower)) + " slowdowns")
+        sys.exit(1)
+    print("PASSED")
@@ -8,6 +8,7 @@ from PHY407_Zafar_Functions_Helper import *
 from PHY407_Zafar_Functions_Plot import *
 from PHY407_Zafar_Functions_Topology import *
 from PHY407_Zafar_Functions_Wasserstein import *
+from itertools import permutations
 
 """
 Test Witness Complex Generation 
@@ -71,4 +72,38 @@ C = np.array(
      [2000, 6000, 3500],
      [2000, 4000, 2500]])
 C_red = hungarianalgorithm(C)
-print("Reduced Cost Matrix: " + str(C_red))
\ No newline at end of file
+print("Reduced Cost Matrix: " + str(C_red))
+
+"""
+Test Optimal Assignment
+Input:
+    [[6 8 9],
+     [2 5 1],
+     [1 6 0]]
+Expected Output:
+    optimalassignment --> [1 2 0], cost 8 + 1 + 1 = 10 (brute force minimum)
+    assignpairs(hungarianalgorithm) --> [0 2 0], not a permutation
+"""
+C = np.array(
+    [[6, 8, 9],
+     [2, 5, 1],
+     [1, 6, 0]], dtype=float)
+print("Optimal Assignment: " + str(optimalassignment(C)))
+print("Brute Force Cost: " + str(min(C[range(3), list(p)].sum() for p in permutations(range(3)))))
+print("Legacy Assignment: " + str(assignpairs(hungarianalgorithm(C.copy()))))
+
+"""
+Test Diagram Distance Metrics
+Input:
+    B1 = [[0.2 0.9],
+          [0.4 0.6]]
+    B2 = [[0.3 1.0]]
+Expected Output:
+    W1 = 0.1*sqrt(2) + 0.2 + 0.1*sqrt(2) = 0.4828
+    W2 = sqrt(0.02 + 0.04 + 0.02) = 0.2828
+    bottleneck = 0.2
+"""
+B1 = np.array([[0.2, 0.9], [0.4, 0.6]])
+B2 = np.array([[0.3, 1.0]])
+for metric in ["W1", "W2", "bottleneck"]:
+    print(metric + " distance: " + str(wassersteinpair(B1, B2, metric)))